@@ -1,21 +1,30 @@
+from functools import cache
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
-from langgraph.prebuilt import create_react_agent
 from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import SystemMessage
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 
+from utils.context import bounded_model_input
+from utils.models import get_model
+from utils.web_search import get_search_service
 
 load_dotenv()
 
-model = init_chat_model("gemini-2.0-flash", model_provider="google_genai")
 
-@tool
-def search_craft_tutorials(query: str) -> str:
+def _search_craft_tutorials(query: str) -> str:
     """Search the Internet for written craft tutorials based on the given query and return a few relevant results."""
-    search_tool = TavilySearchResults(k=5)
-    return search_tool.run(query)
+    return get_search_service().search(query)
+
+
+async def _asearch_craft_tutorials(query: str) -> str:
+    return await get_search_service().asearch(query)
+
+
+search_craft_tutorials = StructuredTool.from_function(
+    func=_search_craft_tutorials,
+    coroutine=_asearch_craft_tutorials,
+    name="search_craft_tutorials",
+)
 
 
 # ✅ Final clean, non-repetitive mentor system prompt
@@ -27,9 +36,14 @@ mentor_prompt = PromptTemplate.from_template(
 """
 )
 
-mentor_agent = create_react_agent(
-    model=model,
-    tools=[search_craft_tutorials],
-    prompt=SystemMessage(content=mentor_prompt.format()),
-    name="mentor_agent"
-)
+@cache
+def get_mentor_agent():
+    from langgraph.prebuilt import create_react_agent
+
+    return create_react_agent(
+        model=get_model("mentor"),
+        tools=[search_craft_tutorials],
+        prompt=SystemMessage(content=mentor_prompt.format()),
+        pre_model_hook=bounded_model_input,
+        name="mentor_agent"
+    )
@@ -1,17 +1,16 @@
+import argparse
+import os
+import threading
 from dotenv import load_dotenv
-from langgraph_supervisor import create_supervisor
-from langchain.chat_models import init_chat_model
 from langchain_core.messages import SystemMessage
 
-from agents.shopper import shopper_agent
-from agents.researcher import craft_research_agent
-from agents.mentor import mentor_agent
+from utils.checkpoint import get_checkpointer
+from utils.context import bounded_model_input
+from utils.models import get_model
 
 load_dotenv()
 
 
-model = init_chat_model("gemini-2.0-flash", model_provider="google_genai")
-
 supervisor_prompt = """
         ✨ You are **Craftwise**, the spirited guide who turns hazy curiosity into handmade joy.
 
@@ -41,15 +40,73 @@ supervisor_prompt = """
 
         """
 
-supervisor = create_supervisor(
-    model=model,
-    agents=[shopper_agent, craft_research_agent, mentor_agent],
-
-    prompt=SystemMessage(content=supervisor_prompt),
-    add_handoff_messages=True,
-    add_handoff_back_messages=True,
-    output_mode="last_message",
-).compile()
-
-with open("supervisor_graph.png", "wb") as f:
-    f.write(supervisor.get_graph().draw_mermaid_png())
\ No newline at end of file
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def build_supervisor():
+    # Agent modules pull in langgraph, Tavily, Google Maps and geopy, so load them on first use
+    from langgraph_supervisor import create_supervisor
+    from agents.shopper import get_shopper_agent
+    from agents.researcher import get_craft_research_agent
+    from agents.mentor import get_mentor_agent
+
+    return create_supervisor(
+        model=get_model("supervisor"),
+        agents=[get_shopper_agent(), get_craft_research_agent(), get_mentor_agent()],
+
+        prompt=SystemMessage(content=supervisor_prompt),
+        pre_model_hook=bounded_model_input,
+        add_handoff_messages=True,
+        add_handoff_back_messages=True,
+        output_mode="last_message",
+    ).compile(checkpointer=get_checkpointer())
+
+
+def get_supervisor():
+    """Returns the compiled supervisor graph, compiling it once on first use."""
+    global _supervisor
+    if _supervisor is None:
+        with _supervisor_lock:
+            if _supervisor is None:
+                _supervisor = build_supervisor()
+    return _supervisor
+
+
+def render_graph(output_path: str = "supervisor_graph.png", force: bool = False) -> bool:
+    """
+    Renders the supervisor graph locally. `.png` output uses a local headless browser
+    (pyppeteer) instead of the remote Mermaid service; any other extension gets the
+    Mermaid source. The source is kept next to the output as `<name>.mmd` and rendering
+    is skipped when it hasn't changed. Returns True if the file was (re)written.
+    """
+    from langchain_core.runnables.graph import MermaidDrawMethod
+
+    graph = get_supervisor().get_graph()
+    mermaid = graph.draw_mermaid()
+    source_path = os.path.splitext(output_path)[0] + ".mmd"
+
+    if not force and os.path.exists(output_path) and os.path.exists(source_path):
+        with open(source_path, encoding="utf-8") as f:
+            if f.read() == mermaid:
+                return False
+
+    with open(source_path, "w", encoding="utf-8") as f:
+        f.write(mermaid)
+    if output_path.endswith(".png"):
+        with open(output_path, "wb") as f:
+            f.write(graph.draw_mermaid_png(draw_method=MermaidDrawMethod.PYPPETEER))
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the Craftwise supervisor graph.")
+    parser.add_argument("output", nargs="?", default="supervisor_graph.png",
+                        help="output file; .png renders an image, anything else writes Mermaid source")
+    parser.add_argument("--force", action="store_true", help="re-render even if the graph hasn't changed")
+    args = parser.parse_args()
+
+    if render_graph(args.output, force=args.force):
+        print(f"Wrote {args.output}")
+    else:
+        print(f"{args.output} is up to date")
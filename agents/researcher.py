@@ -1,18 +1,25 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
-from langgraph.prebuilt import create_react_agent
-from langchain.tools import tool
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain.prompts import PromptTemplate
-from langchain.chains.llm import LLMChain
+from langchain_core.tools import StructuredTool
+from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import SystemMessage
 from langchain_core.output_parsers.string import StrOutputParser
 
+from utils.analysis import extract_json
+from utils.context import bounded_model_input
+from utils.models import get_model
+from utils.research_store import get_research_store
+from utils.translation import Translator, translation_cache
+from utils.web_search import get_search_service
 
 load_dotenv()
 
-# Initialize model
-model = init_chat_model("gemini-2.0-flash", model_provider="google_genai")
+
+def _build_chain(prompt: PromptTemplate):
+    from langchain.chains.llm import LLMChain
+    return LLMChain(llm=get_model("researcher"), prompt=prompt, output_parser=StrOutputParser())
 
 
 # Prompt template
@@ -21,22 +28,44 @@ language_detection_prompt = PromptTemplate.from_template(
 Respond only with the name of the language (e.g. 'Bulgarian', 'Japanese', 'English')."""
 )
 
-# Chain using your model
-language_detection_chain = LLMChain(llm=model, prompt=language_detection_prompt, output_parser=StrOutputParser())
+# Chain using your model, built on first use
+@cache
+def language_detection_chain():
+    return _build_chain(language_detection_prompt)
+
 
 # Tool function
-@tool
-def detect_search_language(craft: str) -> str:
+def _detect_search_language(craft: str) -> str:
     """Uses an LLM to decide the best language to search for information about a given craft."""
-    return language_detection_chain.run({"craft": craft})
+    return language_detection_chain().run({"craft": craft})
+
+
+async def _adetect_search_language(craft: str) -> str:
+    return await language_detection_chain().arun({"craft": craft})
+
+
+detect_search_language = StructuredTool.from_function(
+    func=_detect_search_language,
+    coroutine=_adetect_search_language,
+    name="detect_search_language",
+)
 
 
 # Tool 2: Search the web using Tavily
-@tool
-def web_search_in_language(query: str) -> str:
+def _web_search_in_language(query: str) -> str:
     """Search the internet for a given query (in any language) and return a few relevant results."""
-    search_tool = TavilySearchResults(k=5)
-    return search_tool.run(query)
+    return get_search_service().search(query)
+
+
+async def _aweb_search_in_language(query: str) -> str:
+    return await get_search_service().asearch(query)
+
+
+web_search_in_language = StructuredTool.from_function(
+    func=_web_search_in_language,
+    coroutine=_aweb_search_in_language,
+    name="web_search_in_language",
+)
 
 # Tool 3: Translate text to English
 translate_prompt = PromptTemplate.from_template(
@@ -47,10 +76,23 @@ translate_prompt = PromptTemplate.from_template(
     ---
     """
 )
-translate_chain = LLMChain(llm=model, prompt=translate_prompt, output_parser=StrOutputParser())
 
-@tool
-def translate_to_english(text: str) -> str:
+
+@cache
+def translate_chain():
+    return _build_chain(translate_prompt)
+
+
+@cache
+def get_translator() -> Translator:
+    return Translator(
+        translate=lambda chunk: translate_chain().run({"text": chunk}),
+        atranslate=lambda chunk: translate_chain().arun({"text": chunk}),
+        cache=translation_cache(),
+    )
+
+
+def _translate_to_english(text: str) -> str:
     """Translates a given text into English.
 
     Args:
@@ -59,7 +101,18 @@ def translate_to_english(text: str) -> str:
     Returns:
         str: English translation
     """
-    return translate_chain.run({"text": text})
+    return get_translator().translate(text)
+
+
+async def _atranslate_to_english(text: str) -> str:
+    return await get_translator().atranslate(text)
+
+
+translate_to_english = StructuredTool.from_function(
+    func=_translate_to_english,
+    coroutine=_atranslate_to_english,
+    name="translate_to_english",
+)
 
 
 # Tool 4: Summarize translated content
@@ -71,10 +124,14 @@ summarize_prompt = PromptTemplate.from_template(
     ---
     """
 )
-summarize_chain = LLMChain(llm=model, prompt=summarize_prompt, output_parser=StrOutputParser())
 
-@tool
-def summarize_craft_intro(text: str) -> str:
+
+@cache
+def summarize_chain():
+    return _build_chain(summarize_prompt)
+
+
+def _summarize_craft_intro(text: str) -> str:
     """Summarizes a given text about a specific craft as a craft introduction for beginners.
 
     Args:
@@ -83,17 +140,21 @@ def summarize_craft_intro(text: str) -> str:
     Returns:
         str: summary
     """
-    return summarize_chain.run({"text": text})
+    return summarize_chain().run({"text": text})
 
 
-research_agent_prompt = PromptTemplate.from_template(
-"""
-        You are a helpful craft researcher assistant.
+async def _asummarize_craft_intro(text: str) -> str:
+    return await summarize_chain().arun({"text": text})
 
-        Your job is to research traditional or exotic crafts — such as Bulgarian lacework — using reliable online sources (in the language of origin if needed), and return a beginner-friendly summary that teaches the user what the craft is and how to get started.
-        Use the available tools to find the relevant information.
-        Please follow this exact structure in your response:
 
+summarize_craft_intro = StructuredTool.from_function(
+    func=_summarize_craft_intro,
+    coroutine=_asummarize_craft_intro,
+    name="summarize_craft_intro",
+)
+
+
+RESEARCH_STRUCTURE = """
         === What is it? ===
         Explain what this craft is, where it comes from, and what makes it unique or culturally important.
 
@@ -112,25 +173,239 @@ research_agent_prompt = PromptTemplate.from_template(
         Keep the tone friendly, and informative — like you're introducing the craft to someone who’s curious but knows nothing yet.
 
         DO NOT add any introduction or closing lines. Just return the structured content above.
-        """
+"""
+
+
+# Tool 5: Full research pipeline for one craft, served from the research store when possible
+structured_summary_prompt = PromptTemplate.from_template(
+    """Using the following search results about the craft "{craft}", write a beginner-friendly introduction.
+        Please follow this exact structure in your response:
+"""
+    + RESEARCH_STRUCTURE
+    + """
+    ---
+    {text}
+    ---
+    """
 )
 
-# Define the agent
-craft_research_agent = create_react_agent(
-    model=model,
-    tools=[
-        detect_search_language,
-        web_search_in_language,
-        translate_to_english,
-        summarize_craft_intro
-    ],
-   prompt = SystemMessage(content=research_agent_prompt.format()),
-    name="craft_research_agent"
+
+@cache
+def structured_summary_chain():
+    return _build_chain(structured_summary_prompt)
+
+
+def _results_text(results) -> str:
+    if isinstance(results, str):
+        return results
+    return "\n\n".join(f"{res.get('title', '')}\n{res.get('content', '')}" for res in results)
+
+
+def _result_urls(results) -> list:
+    if isinstance(results, str):
+        return []
+    return [res["url"] for res in results if res.get("url")]
+
+
+# Only the best-ranked foreign-language snippets are worth a translation call
+TRANSLATE_TOP_N = 4
+TRANSLATE_CONCURRENCY = 4
+
+localized_query_prompt = PromptTemplate.from_template(
+    """Given the name or description of a craft: "{craft}", determine which language would likely return the most useful search results online,
+and write a short web search query about this craft in that language.
+Return ONLY a JSON object with the keys "language" (e.g. "Bulgarian", "Japanese", "English") and "query"."""
 )
 
 
+@cache
+def localized_query_chain():
+    return _build_chain(localized_query_prompt)
+
+
+def _parse_localized_query(craft: str, response: str):
+    parsed = extract_json(response)
+    language = str(parsed.get("language") or "English").strip()
+    query = str(parsed.get("query") or craft).strip()
+    return language, query
+
+
+def _merge_results(english_results, local_results, translations: dict) -> list:
+    """Merges both searches by score, swapping in translated snippets and dropping duplicate URLs."""
+    merged = []
+    seen = set()
+    candidates = [(res, False) for res in english_results] + [(res, True) for res in local_results]
+    for res, is_local in sorted(candidates, key=lambda c: c[0].get("score", 0), reverse=True):
+        url = res.get("url")
+        if url in seen:
+            continue
+        if is_local:
+            if url not in translations:
+                continue
+            res = {**res, "content": translations[url]}
+        seen.add(url)
+        merged.append(res)
+    return merged
+
+
+def _top_local(local_results) -> list:
+    ranked = sorted(local_results, key=lambda res: res.get("score", 0), reverse=True)
+    return [res for res in ranked if res.get("url")][:TRANSLATE_TOP_N]
+
+
+def multilingual_search(craft: str) -> list:
+    """Searches in the craft's language of origin and in English at the same time, translates the
+    top foreign snippets in parallel and returns the merged, de-duplicated results in English."""
+    language, local_query = _parse_localized_query(craft, localized_query_chain().run({"craft": craft}))
+    search = get_search_service().search
+    is_english = language.lower() == "english"
+
+    with ThreadPoolExecutor(max_workers=TRANSLATE_CONCURRENCY) as pool:
+        english_future = pool.submit(search, craft)
+        local_results = [] if is_english else _as_list(search(local_query))
+        english_results = _as_list(english_future.result())
+
+        top = _top_local(local_results)
+        translated = pool.map(lambda res: _translate_to_english(res.get("content", "")), top)
+        translations = {res["url"]: text for res, text in zip(top, translated)}
+
+    return _merge_results(english_results, local_results, translations)
+
+
+async def amultilingual_search(craft: str) -> list:
+    language, local_query = _parse_localized_query(craft, await localized_query_chain().arun({"craft": craft}))
+    search = get_search_service().asearch
+    if language.lower() == "english":
+        english_results, local_results = await search(craft), []
+    else:
+        english_results, local_results = await asyncio.gather(search(craft), search(local_query))
+    english_results, local_results = _as_list(english_results), _as_list(local_results)
+
+    semaphore = asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+
+    async def translate(res):
+        async with semaphore:
+            return await _atranslate_to_english(res.get("content", ""))
+
+    top = _top_local(local_results)
+    translated = await asyncio.gather(*(translate(res) for res in top))
+    translations = {res["url"]: text for res, text in zip(top, translated)}
+    return _merge_results(english_results, local_results, translations)
+
+
+def _as_list(results) -> list:
+    # Tavily returns an error string instead of a list when a search fails
+    return results if isinstance(results, list) else []
+
+
+def _search_craft_multilingual(craft: str) -> list:
+    """Searches the web for a craft in its language of origin and in English in parallel, and returns
+    the merged results translated into English. Input should be the craft name."""
+    return multilingual_search(craft)
+
+
+async def _asearch_craft_multilingual(craft: str) -> list:
+    return await amultilingual_search(craft)
+
+
+search_craft_multilingual = StructuredTool.from_function(
+    func=_search_craft_multilingual,
+    coroutine=_asearch_craft_multilingual,
+    name="search_craft_multilingual",
+)
+
+
+def research_craft_pipeline(craft: str):
+    """Runs the multilingual search and summarisation for a craft. Returns (summary, sources)."""
+    results = multilingual_search(craft)
+    summary = structured_summary_chain().run({"craft": craft, "text": _results_text(results)})
+    return summary, _result_urls(results)
+
+
+async def aresearch_craft_pipeline(craft: str):
+    results = await amultilingual_search(craft)
+    summary = await structured_summary_chain().arun({"craft": craft, "text": _results_text(results)})
+    return summary, _result_urls(results)
+
+
+def _cached_research(craft: str):
+    store = get_research_store()
+    entry = store.get(craft)
+    if entry is None:
+        return None
+    summary, _, is_stale = entry
+    if is_stale:
+        store.refresh_in_background(craft, research_craft_pipeline)
+    return summary
+
+
+def _research_craft(craft: str) -> str:
+    """Returns a structured beginner introduction to a craft (what it is, styles, materials, how to start, history).
+    Answers instantly for crafts that were researched before. Input should be the craft name, e.g. 'Bulgarian lace'."""
+    cached = _cached_research(craft)
+    if cached is not None:
+        return cached
+
+    summary, sources = research_craft_pipeline(craft)
+    # Without sources the search came back empty; don't keep a summary that has nothing behind it
+    if sources:
+        get_research_store().put(craft, summary, sources)
+    return summary
+
+
+async def _aresearch_craft(craft: str) -> str:
+    cached = await asyncio.to_thread(_cached_research, craft)
+    if cached is not None:
+        return cached
+
+    summary, sources = await aresearch_craft_pipeline(craft)
+    if sources:
+        await asyncio.to_thread(get_research_store().put, craft, summary, sources)
+    return summary
+
+
+research_craft = StructuredTool.from_function(
+    func=_research_craft,
+    coroutine=_aresearch_craft,
+    name="research_craft",
+)
+
+
+research_agent_prompt = PromptTemplate.from_template(
+"""
+        You are a helpful craft researcher assistant.
+
+        Your job is to research traditional or exotic crafts — such as Bulgarian lacework — using reliable online sources (in the language of origin if needed), and return a beginner-friendly summary that teaches the user what the craft is and how to get started.
+        Always call the research_craft tool first with the craft name; it returns a ready, structured introduction and is much faster than the other tools.
+        If you need details research_craft didn't cover, prefer search_craft_multilingual over searching and translating step by step.
+        Please follow this exact structure in your response:
+"""
+    + RESEARCH_STRUCTURE
+)
+
+# Define the agent
+@cache
+def get_craft_research_agent():
+    from langgraph.prebuilt import create_react_agent
+
+    return create_react_agent(
+        model=get_model("researcher"),
+        tools=[
+            research_craft,
+            search_craft_multilingual,
+            detect_search_language,
+            web_search_in_language,
+            translate_to_english,
+            summarize_craft_intro
+        ],
+        prompt=SystemMessage(content=research_agent_prompt.format()),
+        pre_model_hook=bounded_model_input,
+        name="craft_research_agent"
+    )
+
+
 
 # Example usage
 if __name__ == "__main__":
-    response = craft_research_agent.invoke({"input": "I want to learn Bulgarian lacework"})
+    response = get_craft_research_agent().invoke({"input": "I want to learn Bulgarian lacework"})
     print(response)
@@ -0,0 +1,156 @@
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import PromptTemplate
+
+from utils.intent import CRAFT_STEMS
+from utils.models import get_model
+from utils.state import CraftState
+
+load_dotenv()
+
+# Send clear requests straight to one agent instead of through the supervisor. Off by default;
+# check the rules with benchmarks/router.py before turning it on with CRAFTWISE_ROUTER=1
+ROUTER_ENABLED = os.getenv("CRAFTWISE_ROUTER", "0") == "1"
+# Rewrite routed answers in Craftwise's voice with one extra (cheap) model call
+PERSONA_REWRITE = os.getenv("CRAFTWISE_ROUTER_REWRITE", "0") == "1"
+
+# The supervisor path costs one model call to pick the agent and one to rewrite its answer
+SUPERVISOR_HOPS = 2
+
+# Only words that name the agent's job; "how do I", "what is" or "how much" fit every agent
+SHOPPING = re.compile(
+    r"\b(buy|purchase|prices?|cheap(est)?|where (can|do|could|should) i (get|buy))\b"
+    r"|\b(comprar|precio|acheter|prix|kaufen|preis|comprare|prezzo)\b"
+    r"|купя|купувам|цена|купить",
+    re.IGNORECASE,
+)
+RESEARCH = re.compile(
+    r"\b(tell me about|history|origins?|traditions?|traditional|cultural|culture|come from)\b"
+    r"|\b(historia|origen|histoire|geschichte|herkunft|storia)\b"
+    r"|история|произход",
+    re.IGNORECASE,
+)
+MENTOR = re.compile(
+    r"\b(what does .{1,40} mean|meaning of|techniques?|stitch(es)?|explain|difference between|"
+    r"mistakes?|written tutorials?)\b"
+    r"|\b(técnica|technik)\b|техника",
+    re.IGNORECASE,
+)
+RULES = {
+    "shopper_agent": SHOPPING,
+    "craft_research_agent": RESEARCH,
+    "mentor_agent": MENTOR,
+}
+# A place the user is shopping in ("in Sofia", "near Plovdiv"); without one the supervisor asks first
+LOCATION = re.compile(r"\b(in|near|around|from|en|à|cerca de|bei|в|във|около)\s+(?!me\b|my\b|the\b|a\b)[A-ZÀ-ÖА-Я][\w'-]+")
+
+persona_prompt = PromptTemplate.from_template("""
+You are Craftwise, a warm and encouraging craft guide. Rewrite the answer below in your voice:
+keep every fact, list and web link exactly as it is, don't add new information, and end with
+one inviting next step. Return only the rewritten answer.
+
+User: {message}
+
+Answer:
+{answer}
+""")
+
+
+@dataclass
+class Route:
+    agent: str
+    reason: str
+
+
+def names_craft(message: str) -> bool:
+    return any(word.startswith(CRAFT_STEMS) for word in re.findall(r"\w+", message.lower()))
+
+
+def route_message(message: str, craft_state: CraftState = None):
+    """
+    Picks the agent for a message when exactly one of them clearly fits, None otherwise.
+    Runs locally in microseconds; anything ambiguous or conversational stays with the supervisor.
+    """
+    if not ROUTER_ENABLED:
+        return None
+    matches = {agent: rule.search(message) for agent, rule in RULES.items()}
+    matches = {agent: match for agent, match in matches.items() if match}
+    if len(matches) != 1:
+        return None
+
+    agent, match = next(iter(matches.items()))
+    # Finding shops needs a location, and asking for it is the supervisor's job
+    if agent == "shopper_agent" and not LOCATION.search(message):
+        return None
+    # "Tell me its history" only makes sense to the researcher if we know which craft
+    if agent == "craft_research_agent" and not (names_craft(message) or (craft_state and craft_state.craft)):
+        return None
+    return Route(agent=agent, reason=match.group(0))
+
+
+def get_agent(name: str):
+    from agents.shopper import get_shopper_agent
+    from agents.researcher import get_craft_research_agent
+    from agents.mentor import get_mentor_agent
+
+    return {
+        "shopper_agent": get_shopper_agent,
+        "craft_research_agent": get_craft_research_agent,
+        "mentor_agent": get_mentor_agent,
+    }[name]()
+
+
+def final_answer(response: dict) -> str:
+    for msg in reversed(response["messages"]):
+        if isinstance(msg, AIMessage) and msg.content and not msg.tool_calls:
+            return msg.content if isinstance(msg.content, str) else "".join(
+                part if isinstance(part, str) else part.get("text", "") for part in msg.content
+            )
+    return ""
+
+
+def persona_messages(message: str, answer: str) -> list:
+    return [HumanMessage(content=persona_prompt.format(message=message, answer=answer))]
+
+
+async def arewrite_in_persona(message: str, answer: str) -> str:
+    try:
+        return (await get_model("persona").ainvoke(persona_messages(message, answer))).content
+    except Exception as e:
+        print(f"Persona rewrite failed: {e}")
+        return answer
+
+
+def hops_saved() -> int:
+    return SUPERVISOR_HOPS - (1 if PERSONA_REWRITE else 0)
+
+
+class RouterStats:
+    """Counts routed turns and the supervisor model calls they skipped."""
+
+    def __init__(self):
+        self.turns = 0
+        self.routed = {}
+        self.hops_saved = 0
+        self._lock = threading.Lock()
+
+    def record(self, route) -> None:
+        with self._lock:
+            self.turns += 1
+            if route is None:
+                return
+            self.routed[route.agent] = self.routed.get(route.agent, 0) + 1
+            self.hops_saved += hops_saved()
+        print(f"Routed to {route.agent} on {route.reason!r}: {hops_saved()} supervisor hop(s) saved")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"turns": self.turns, "routed": dict(self.routed), "hops_saved": self.hops_saved}
+
+
+router_stats = RouterStats()
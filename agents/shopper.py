@@ -1,70 +1,123 @@
 
+import asyncio
 import os
-import googlemaps
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
 from dotenv import load_dotenv
-from langgraph.prebuilt import create_react_agent
-from langchain.chat_models import init_chat_model
-from langchain.tools import tool
-from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_core.tools import StructuredTool, tool
 from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import SystemMessage
-from googlemaps.places import places_nearby
-from geopy.geocoders import Nominatim
 
+from utils.cache import TTLCache
+from utils.costing import SupplyItem, calculate_costs, format_costs
+from utils.context import bounded_model_input
+from utils.models import get_model
+from utils.web_search import get_search_service
 
 load_dotenv()
 
-API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-gmaps_client = googlemaps.Client(key=API_KEY)
+# Geocodes barely change, so keep them on disk; nearby places are only kept for a day
+geocode_cache = TTLCache(
+    maxsize=4096,
+    ttl=float(os.getenv("CRAFTWISE_GEOCODE_CACHE_TTL", str(30 * 24 * 3600))),
+    path=os.getenv("CRAFTWISE_GEOCODE_CACHE_PATH", ".cache/geocode.sqlite"),
+)
+places_cache = TTLCache(maxsize=1024, ttl=float(os.getenv("CRAFTWISE_PLACES_CACHE_TTL", str(24 * 3600))))
 
-model = init_chat_model("gemini-2.0-flash", model_provider="google_genai")
 
-@tool
-def add(a: float, b: float):
-    """Add two numbers."""
-    return a + b
+@cache
+def get_gmaps_client():
+    import googlemaps
+    return googlemaps.Client(key=os.getenv("GOOGLE_MAPS_API_KEY"))
+
+
+@cache
+def get_geocoder():
+    """Shared Nominatim geocoder, throttled to the service's limit of one request per second."""
+    from geopy.extra.rate_limiter import RateLimiter
+    from geopy.geocoders import Nominatim
+
+    geolocator = Nominatim(user_agent="craft_mind_agent")
+    return RateLimiter(geolocator.geocode, min_delay_seconds=1, max_retries=1, swallow_exceptions=False)
 
-@tool
-def multiply(a: float, b: float):
-    """Multiply two numbers."""
-    return a * b
 
 @tool
-def divide(a: float, b: float):
-    """Divide two numbers."""
-    return a / b
+def calculate_project_cost(items: list[SupplyItem], currency: str = "EUR") -> str:
+    """Calculate the cost of every supply item and the project total in one call.
+    Pass all items at once with their needed quantity and unit, the shop price, what amount
+    the price refers to (e.g. 5 EUR per 100 g) and its currency. Units and currencies are converted automatically."""
+    return format_costs(calculate_costs(items, currency))
+
 
 
+def _normalize_location(location_name: str) -> str:
+    return " ".join(location_name.lower().replace(",", " , ").split())
+
+
+def _parse_lat_long(location_name: str):
+    parts = location_name.split(",")
+    if len(parts) != 2:
+        return None
+    try:
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+
 
 def get_lat_long_from_location(location_name: str) -> str:
     """
     Convert a location name into a latitude,longitude string.
     """
+    if _parse_lat_long(location_name):
+        return location_name.replace(" ", "")
+
+    key = _normalize_location(location_name)
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        return cached or "⚠️ Location not found."
+
     try:
-        geolocator = Nominatim(user_agent="craft_mind_agent")
-        location = geolocator.geocode(location_name)
+        location = get_geocoder()(location_name)
 
         if location:
-            return f"{location.latitude},{location.longitude}"
+            lat_long = f"{location.latitude},{location.longitude}"
+            geocode_cache.set(key, lat_long)
+            return lat_long
         else:
+            # Remember misses too, an empty string marks an unknown place
+            geocode_cache.set(key, "")
             return "⚠️ Location not found."
     except Exception as e:
         return f"❌ Error retrieving location: {str(e)}"
 
 
+def _places_key(lat_long: str, radius: int, keyword: str) -> str:
+    # ~100m grid, so slightly different geocodes of the same city share an entry
+    lat, lng = _parse_lat_long(lat_long)
+    return f"{lat:.3f},{lng:.3f}|{radius}|{' '.join(keyword.lower().split())}"
+
+
 
 
 def find_craft_shops(location: str, radius: int = 5000, keyword: str = "yarn shop") -> str:
+    from googlemaps.places import places_nearby
+
     location_lat_long = get_lat_long_from_location(location)
     try:
-        places_result = places_nearby(
-            client=gmaps_client,
-            location=location_lat_long,
-            radius=radius,
-            keyword=keyword,
-            type="store"
-        )
-        results = places_result.get("results", [])
+        key = _places_key(location_lat_long, radius, keyword) if _parse_lat_long(location_lat_long) else None
+        results = places_cache.get(key) if key else None
+        if results is None:
+            places_result = places_nearby(
+                client=get_gmaps_client(),
+                location=location_lat_long,
+                radius=radius,
+                keyword=keyword,
+                type="store"
+            )
+            results = places_result.get("results", [])[:5]
+            if key:
+                places_cache.set(key, results)
+
         if not results:
             return "No nearby craft or yarn shops found."
 
@@ -80,19 +133,24 @@ def find_craft_shops(location: str, radius: int = 5000, keyword: str = "yarn sho
 
 
 
-@tool
-def search_nearby_craft_shops(location: str, keyword: str) -> str:
+def _search_nearby_craft_shops(location: str, keyword: str) -> str:
     """Search for nearby shops for a given keyword using Google Maps from a given location string or lat,lng."""
     return find_craft_shops(location=location, keyword=keyword)
 
 
+async def _asearch_nearby_craft_shops(location: str, keyword: str) -> str:
+    # googlemaps and geopy only ship blocking clients, so keep them off the event loop
+    return await asyncio.to_thread(find_craft_shops, location=location, keyword=keyword)
 
-@tool
-def find_products_with_prices(query: str) -> str:
-    """Search for products and prices using Tavily. Input should be a product search query."""
-    search_tool = TavilySearchResults(k=5)
-    results = search_tool.run(query)
 
+search_nearby_craft_shops = StructuredTool.from_function(
+    func=_search_nearby_craft_shops,
+    coroutine=_asearch_nearby_craft_shops,
+    name="search_nearby_craft_shops",
+)
+
+
+def _format_product_results(results) -> str:
     output = []
     for res in results:
         title = res.get("title", "")
@@ -102,26 +160,115 @@ def find_products_with_prices(query: str) -> str:
 
     return "\n\n".join(output) if output else "No results found."
 
+
+def _find_products_with_prices(query: str) -> str:
+    """Search for products and prices using Tavily. Input should be a product search query."""
+    return _format_product_results(get_search_service().search(query))
+
+
+async def _afind_products_with_prices(query: str) -> str:
+    return _format_product_results(await get_search_service().asearch(query))
+
+
+find_products_with_prices = StructuredTool.from_function(
+    func=_find_products_with_prices,
+    coroutine=_afind_products_with_prices,
+    name="find_products_with_prices",
+)
+
+
+# Bounded so a long supply list doesn't fire dozens of searches at once
+SUPPLY_SEARCH_CONCURRENCY = int(os.getenv("CRAFTWISE_SUPPLY_SEARCH_CONCURRENCY", "5"))
+RESULTS_PER_ITEM = 3
+SNIPPET_CHARS = 200
+
+
+def _supply_query(item: str, location: str) -> str:
+    return f"buy {item} price {location}".strip()
+
+
+def _compact_results(results) -> list:
+    if not isinstance(results, list):
+        return []
+    return [
+        {
+            "title": res.get("title", ""),
+            "snippet": " ".join(res.get("content", "").split())[:SNIPPET_CHARS],
+            "url": res.get("url", ""),
+        }
+        for res in results[:RESULTS_PER_ITEM]
+    ]
+
+
+def _format_supplies(items: list, item_results: list, shops: str) -> str:
+    output = []
+    for item, results in zip(items, item_results):
+        output.append(f"## {item}")
+        if not results:
+            output.append("No results found.")
+        for res in results:
+            output.append(f"🛒 **{res['title']}** – {res['snippet']}\n🔗 {res['url']}")
+        output.append("")
+    output.append(shops)
+    return "\n".join(output)
+
+
+def _search_supplies(items: list[str], location: str, shop_keyword: str = "craft store") -> str:
+    """Search online shops and prices for every item of a supply list at once, and look up physical
+    shops near the location on Google Maps at the same time. Pass the whole list in one call."""
+    search = get_search_service().search
+    with ThreadPoolExecutor(max_workers=SUPPLY_SEARCH_CONCURRENCY + 1) as pool:
+        shops = pool.submit(find_craft_shops, location=location, keyword=shop_keyword)
+        item_results = list(pool.map(lambda item: _compact_results(search(_supply_query(item, location))), items))
+        return _format_supplies(items, item_results, shops.result())
+
+
+async def _asearch_supplies(items: list[str], location: str, shop_keyword: str = "craft store") -> str:
+    semaphore = asyncio.Semaphore(SUPPLY_SEARCH_CONCURRENCY)
+
+    async def search(item):
+        async with semaphore:
+            return _compact_results(await get_search_service().asearch(_supply_query(item, location)))
+
+    shops, *item_results = await asyncio.gather(
+        asyncio.to_thread(find_craft_shops, location=location, keyword=shop_keyword),
+        *(search(item) for item in items),
+    )
+    return _format_supplies(items, item_results, shops)
+
+
+search_supplies = StructuredTool.from_function(
+    func=_search_supplies,
+    coroutine=_asearch_supplies,
+    name="search_supplies",
+)
+
 shopper_prompt = PromptTemplate.from_template(
         """
         You are a shopper agent specifically designed for shopping for craft tools and supplies.
         Given a list of supplies (e.g. 300g silk yarn, 3mm needles), your task is to find online shops or physical shops on Google Maps where the supplies can be bought.
         Additionally, you need to calculate the total estimated cost of the craft project based on the needed and available supplies.
         INSTRUCTIONS:
-        - For every item in the supplies list, make a Google search to find relevant online shops in the user's location.
-        - If possible, infer the item prices in the online shops and calculate the total estimated cost of the project based on the retrieved prices per item and available math tools (add, divide, multiply).
+        - Call search_supplies ONCE with the whole supplies list and the user's location. It searches online shops for every item and finds physical stores on Google Maps in parallel.
+        - Only use find_products_with_prices or search_nearby_craft_shops to follow up on a single item or a different shop type.
+        - If possible, infer the item prices in the online shops, then call calculate_project_cost ONCE with the whole supply list to get per-item costs and the total estimated cost of the project. Don't do the arithmetic yourself.
         - If for some products you cannot infer prices, just say you don't know how much the item will cost.
-        - In addition, search for physical stores on Google Maps in the user's location and return them as an alternative.
+        - Return the physical stores on Google Maps in the user's location as an alternative.
         - Return the list of items with where to buy them, and the total cost of the project.
         """
 )
 
-shopper_agent = create_react_agent(
-    model=model,
-    tools=[find_products_with_prices, search_nearby_craft_shops, add, divide, multiply],
-    prompt=SystemMessage(content=shopper_prompt.format()),
-    name="shopper_agent",
-)
+@cache
+def get_shopper_agent():
+    from langgraph.prebuilt import create_react_agent
+
+    return create_react_agent(
+        model=get_model("shopper"),
+        tools=[search_supplies, find_products_with_prices, search_nearby_craft_shops, calculate_project_cost],
+        prompt=SystemMessage(content=shopper_prompt.format()),
+        pre_model_hook=bounded_model_input,
+        name="shopper_agent",
+    )
 
 if __name__ == "__main__":
     find_craft_shops()
@@ -1,66 +1,40 @@
-import json
-import base64
-import mimetypes
+import asyncio
+import os
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 import gradio as gr
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.runnables import Runnable
-from langchain.prompts import PromptTemplate
-from langchain.chat_models import init_chat_model
-
-from utils.analysis import analyze_media_structured, extract_json
-from agents.planner import supervisor
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
+
+from utils.analysis import cancel_analysis_job, start_analysis_job
+from agents.planner import get_supervisor
+from agents.router import (
+    PERSONA_REWRITE, arewrite_in_persona, final_answer, get_agent, route_message, router_stats,
+)
+from utils.checkpoint import checkpointing_enabled
+from utils.context import SUMMARY_PREFIX
 from utils.custom_css import CUSTOM_CSS
-from utils.search import search_youtube
+from utils.search import asearch_youtube
 from utils.state import CraftState
+from utils.sessions import SessionState, sessions, session_id_from_request
+from utils.models import get_model
+from utils.intent import aupdate_craft_state
+from utils.semantic_cache import response_cache
+from utils.video_intent import local_video_intent
 
 load_dotenv()
 
-model = init_chat_model("gemini-2.0-flash", model_provider="google_genai")
+# Stream supervisor replies token by token into the chat; set CRAFTWISE_STREAM=0 to wait for the full reply
+STREAM_RESPONSES = os.getenv("CRAFTWISE_STREAM", "1") != "0"
 
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="resources"), name="static")
 
+# Per-session handlers let the queue run many chats at once
+CONCURRENCY_LIMIT = int(os.getenv("CRAFTWISE_CONCURRENCY", "32"))
 
-# Store uploaded file path persistently
-uploaded_file_path = {"path": None}
-state = {
-    "uploaded_file": None, 
-    "media_processed": False, 
-    "analysis_result": None, 
-}
-
-
-main_state = CraftState()
-
-video_intent_prompt = PromptTemplate.from_template("""
-You are a helpful assistant that determines whether a user is asking for a video tutorial explicitly. 
-Answer only "yes" or "no". If there's no mention of the user asking for a video tutorial, always return no.
-
-User message: {message}
-""")
-
-def detect_video_request(state: CraftState, model: Runnable, messages) -> CraftState:   
-    experience = extract_project_craft_experience(messages=messages, model=model)
-    state.project = experience['project'] 
-    state.craft = experience['craft'] 
-    state.experience_level = experience['experience_level'] 
-    state.query = experience["query"]
-    state = detect_video_request_llm(state, model)
-    
-    return state
-
-
-def detect_video_request_llm(state: CraftState, model: Runnable) -> CraftState:
-    prompt = video_intent_prompt.format(message=state.user_message)
-    result = model.invoke([HumanMessage(content=prompt)]).content.lower().strip()
-    state.asked_for_video = result.startswith("yes")
-    return state
 
-
-def fetch_youtube_video(state: CraftState) -> CraftState:
+def build_video_query(state: CraftState) -> str:
     query = state.project + " " + state.craft + " "  + state.experience_level + " " + state.query
     # Deduplicate query for duplicate words
     words = query.split()
@@ -71,9 +45,11 @@ def fetch_youtube_video(state: CraftState) -> CraftState:
         if lw not in seen:
             deduped_words.append(word)
             seen.add(lw)
-    query = " ".join(deduped_words)
-    video_url = search_youtube(query)
-    state.video_url = video_url
+    return " ".join(deduped_words)
+
+
+async def afetch_youtube_video(state: CraftState) -> CraftState:
+    state.video_url = await asearch_youtube(build_video_query(state))
     return state
 
 
@@ -84,119 +60,35 @@ def generate_final_response(state: CraftState) -> str:
     return response
 
 
-def encode_file_to_media_message(file_path: str):
-    mime_type, _ = mimetypes.guess_type(file_path)
-    if not mime_type:
-        mime_type = "application/octet-stream"
-
-    with open(file_path, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode()
-
-    if mime_type.startswith("image"):
-        return [
-            {
-                "type": "image_url",
-                "image_url": f"data:{mime_type};base64,{encoded}",
-            },
-            {
-                "type": "text",
-                "text": "Please evaluate this image of my craft project.",
-            },
-        ]
-    elif mime_type.startswith("video"):
-        return [
-            {
-                "type": "media",
-                "data": encoded,
-                "mime_type": mime_type,
-            },
-            {
-                "type": "text",
-                "text": "This is a video of me working on my project. Could you give feedback?",
-            },
-        ]
-    else:
-        return [{"type": "text", "text": "Unsupported file type uploaded."}]
-
-
-
-# Define prompt template
-extraction_prompt = PromptTemplate.from_template("""
-You are an assistant that extracts structured information from a conversation between a user and an assistant.
-Extract the following fields:
-1. project – what the user wants to create or work on (e.g., paper crane, knitted scarf)
-2. craft – what type of craft it involves (e.g., origami, knitting, crochet)
-3. experience level – the user's skill level (one of beginner, intermediate, advanced, or ""). If you cannot classify as beginner, intermediate, advanced, return empty string as a value
-4. query - this refers to what the user is actually looking for, it can be the project itself (e.g. knitting) or a specific technique related to it (e.g. how to cast on). Return the query as 3 words max.
-Return ONLY a JSON object with these keys: "project", "craft", "experience_level", "query".
-
-Conversation:
-{conversation}
-""")
-
-# Function to extract structured data
-def extract_project_craft_experience(messages: list, model: Runnable) -> dict:
-    conversation = "\n".join(
-        f"{'User' if isinstance(msg, HumanMessage) else 'Assistant'}: {msg.content}"
-        for msg in messages
-    )
-    prompt = extraction_prompt.format(conversation=conversation)
-    response = model.invoke([HumanMessage(content=prompt)]).content
-    parsed = extract_json(response)
-    try:
-        return parsed
-    except json.JSONDecodeError:
-        return {
-            "project": None,
-            "craft": None,
-            "experience_level": None
-        }
-
-
-
-def chat_with_agent(message, history):
+def history_to_messages(history) -> list:
     # Convert history to LangChain messages
     messages = []
 
     for user_msg, assistant_msg in history:
         messages.append(HumanMessage(content=user_msg))
         messages.append(AIMessage(content=assistant_msg))
-   
+    return messages
 
-    # If a file is uploaded, attach it in proper format    
-    if uploaded_file_path["path"] and not state['media_processed']:
-        analysis = analyze_media_structured(uploaded_file_path["path"])
-        state["analysis_result"] = analysis
-        state['media_processed'] = True
 
-        # Clear uploaded file reference to avoid duplicate analysis
-        uploaded_file_path["path"] = None
+INTERNAL_MESSAGE_MARKERS = [
+    "transferring to", "transferring back to", "invoking tool", "calling agent"
+]
 
-        return analysis
-    
-    global main_state
-    if len(messages) > 0:
-        print("The type of message id is ", type(messages[-1]))
-    main_state.user_message = messages[-1].content + " " + message if len(messages) > 0 else message
-    
-    messages.append(HumanMessage(content=message))
-    main_state = detect_video_request(main_state, model, messages)
-    if main_state.asked_for_video:
-        main_state = fetch_youtube_video(main_state)
-        response = generate_final_response(main_state)
-        main_state.asked_for_video = False
-        main_state.video_url = None
-        messages.append(AIMessage(content=response))
-    
-    response = supervisor.invoke({"messages": messages})
 
-    # Filter response
+def is_internal_message(text: str) -> bool:
+    return any(skip in text.lower() for skip in INTERNAL_MESSAGE_MARKERS)
+
+
+def filter_supervisor_response(response: dict, history) -> str:
+    # With a checkpointer the response holds the whole thread; only this turn's replies are new
+    turn_messages = response["messages"]
+    last_human = max((i for i, msg in enumerate(turn_messages) if isinstance(msg, HumanMessage)), default=-1)
+    turn_messages = turn_messages[last_human + 1:]
+
     filtered_ai_messages = []
-    for msg in response["messages"]:
+    for msg in turn_messages:
         if isinstance(msg, AIMessage) and msg.content:
-            if any(skip in msg.content.lower() for skip in [
-                "transferring to", "transferring back to", "invoking tool", "calling agent"
-            ]):
+            if is_internal_message(msg.content):
                 continue
             if msg.content not in [m[1] for m in history]:
                 filtered_ai_messages.append(msg.content)
@@ -204,16 +96,308 @@ def chat_with_agent(message, history):
     return "\n\n".join(filtered_ai_messages)
 
 
-def handle_file_upload(file):
+def supervisor_config(session: SessionState):
+    """The supervisor keeps each session's conversation in its checkpointer under the session id."""
+    if not checkpointing_enabled():
+        return None
+    return {"configurable": {"thread_id": session.session_id, "conversation_context": session.context}}
+
+
+def supervisor_input(session: SessionState, messages: list, thread_messages: list) -> dict:
+    """Only the new message is sent when the thread is checkpointed. Without a checkpoint for the
+    thread (checkpointing off, or a fresh or evicted thread) the bounded history seeds it instead."""
+    if thread_messages:
+        return {"messages": messages[-1:]}
+    return {"messages": session.context.window(messages, "supervisor")}
+
+
+def thread_matches_history(thread_messages: list, history) -> bool:
+    """Whether the checkpointed thread still ends where the chat does. Gradio's retry, undo and edit
+    rewind the history, and a thread that went further would answer from turns the user took back."""
+    user_turns = [
+        msg for msg in thread_messages
+        if isinstance(msg, HumanMessage) and not str(msg.content).startswith(SUMMARY_PREFIX)
+    ]
+    # A seeded window may have summarised early turns away, so the thread can hold fewer, never more
+    return bool(user_turns) and len(user_turns) <= len(history) and user_turns[-1].content == history[-1][0]
+
+
+async def aload_thread(config, history) -> list:
+    if config is None:
+        return []
+    supervisor = get_supervisor()
+    if history:
+        thread_messages = (await supervisor.aget_state(config)).values.get("messages", [])
+        if thread_matches_history(thread_messages, history):
+            return thread_messages
+    # A new or cleared chat starts a new thread, and a rewound one is seeded again from its history
+    await asyncio.to_thread(supervisor.checkpointer.delete_thread, config["configurable"]["thread_id"])
+    return []
+
+
+def agent_input(session: SessionState, messages: list, thread_messages: list) -> dict:
+    """A routed agent doesn't read the supervisor's checkpoint, so it gets the thread so far plus the new message."""
+    return {"messages": thread_messages + supervisor_input(session, messages, thread_messages)["messages"]}
+
+
+def turn_update(session: SessionState, messages: list, thread_messages: list, name: str, answer: str) -> dict:
+    """What a turn answered outside the supervisor adds to its thread, so later turns see it like any other."""
+    turn = supervisor_input(session, messages, thread_messages)["messages"]
+    return {"messages": turn + [AIMessage(content=answer, name=name)]}
+
+
+async def arecord_turn(config, update: dict) -> None:
+    if config is not None:
+        await get_supervisor().aupdate_state(config, update, as_node="supervisor")
+
+
+def is_cacheable(message, history, route) -> bool:
+    """Only opening questions are answered from the cache: no earlier turns to depend on, no video
+    lookup, and nothing local or price-dependent for the shopper."""
+    if history or local_video_intent(message) is not False:
+        return False
+    return route is None or route.agent != "shopper_agent"
+
+
+def cached_reply(session: SessionState, message, history, route):
+    if not is_cacheable(message, history, route):
+        return None
+    hit = response_cache.get(message)
+    if hit is None:
+        return None
+    entry, _ = hit
+    for name, value in entry["state"].items():
+        setattr(session.craft_state, name, value)
+    return entry["answer"]
+
+
+def remember_reply(session: SessionState, message, history, route, reply: str) -> None:
+    if not reply or not is_cacheable(message, history, route):
+        return
+    state = session.craft_state
+    response_cache.set(message, {
+        "answer": reply,
+        "state": {name: getattr(state, name) for name in ("project", "craft", "experience_level", "query")},
+    })
+
+
+async def arun_routed_turn(session: SessionState, route, message, messages: list, thread_messages: list, config) -> str:
+    """Answers a clearly routed message with its agent directly, skipping the supervisor's model calls."""
+    agent = get_agent(route.agent)
+    answer = final_answer(await agent.ainvoke(agent_input(session, messages, thread_messages), config=config))
+    if PERSONA_REWRITE:
+        answer = await arewrite_in_persona(message, answer)
+    await arecord_turn(config, turn_update(session, messages, thread_messages, route.agent, answer))
+    return answer
+
+
+MEDIA_ANALYSIS_FAILED = "Sorry, I couldn't analyse that file. Please try uploading it again."
+
+
+async def aprepare_turn(session: SessionState, message, history):
+    """Runs everything that happens before the supervisor. Returns the messages to send to
+    the supervisor, or a finished reply (e.g. media analysis) that short-circuits the turn."""
+    messages = history_to_messages(history)
+
+    if session.uploaded_file and not session.media_processed:
+        # Usually already running (or done) since the upload; only start it here if it isn't
+        job = session.analysis_job or start_analysis_job(session.uploaded_file)
+        session.analysis_job = job
+        try:
+            analysis = await asyncio.wrap_future(job)
+        except asyncio.CancelledError:
+            # Only a replaced or cleared file cancels a queued job; anything else cancelled this turn
+            if not job.cancelled():
+                raise
+            analysis = None
+        except Exception as e:
+            print(f"Media analysis failed: {e}")
+            analysis = MEDIA_ANALYSIS_FAILED
+
+        # If the file was replaced or cleared while we waited, its analysis no longer applies:
+        # the message is answered as usual and a new upload gets its own turn
+        if session.analysis_job is job:
+            session.analysis_result = None if analysis is MEDIA_ANALYSIS_FAILED else analysis
+            session.media_processed = True
+
+            # Clear uploaded file reference to avoid duplicate analysis
+            session.uploaded_file = None
+            session.analysis_job = None
+
+            return messages, analysis
+
+    messages.append(HumanMessage(content=message))
+    return messages, None
+
+
+async def aresolve_video_reply(session: SessionState, messages: list) -> str:
+    """Updates project, craft, level, query and video intent from the latest turn (one structured call,
+    or none if nothing new was said) and, if a video was asked for, looks it up. Runs alongside the
+    supervisor, not in front of it."""
+    craft_state = await aupdate_craft_state(session.craft_state, messages, get_model("extraction"))
+    if not craft_state.asked_for_video:
+        return ""
+
+    craft_state = await afetch_youtube_video(craft_state)
+    response = generate_final_response(craft_state)
+    craft_state.asked_for_video = False
+    craft_state.video_url = None
+    return response
+
+
+async def achat_with_agent(message, history, request: gr.Request = None):
+    """Async chat handler: every model, tool and HTTP call is awaited so one event loop
+    can serve many conversations at once."""
+    session = sessions.get(session_id_from_request(request))
+    messages, reply = await aprepare_turn(session, message, history)
+    if reply is not None:
+        return reply
+
+    config = supervisor_config(session)
+    thread_messages = await aload_thread(config, history)
+    route = route_message(message, session.craft_state)
+    cached = cached_reply(session, message, history, route)
+    if cached is not None:
+        await arecord_turn(config, turn_update(session, messages, thread_messages, "supervisor", cached))
+        return cached
+
+    router_stats.record(route)
+    video_task = asyncio.create_task(aresolve_video_reply(session, messages))
+    if route is not None:
+        reply = await arun_routed_turn(session, route, message, messages, thread_messages, config)
+    else:
+        response = await get_supervisor().ainvoke(supervisor_input(session, messages, thread_messages), config=config)
+        reply = filter_supervisor_response(response, history)
+    session.context.schedule_summary(messages)
+    video_reply = await video_task
+    # Remembered after the video task, which also brings the craft state up to date
+    remember_reply(session, message, history, route, reply)
+    return reply + video_reply
+
+
+def _chunk_text(chunk) -> str:
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in chunk.content
+    )
+
+
+# Graph nodes whose model output is the reply; models called from inside tools run under "tools"
+MODEL_NODES = ("agent", "supervisor")
+
+
+async def astream_reply(graph, graph_input: dict, config, fallback):
+    """
+    Yields the reply built so far from the tokens of the graph's model nodes, nested agents included,
+    one segment per message without handoff chatter. If nothing could be streamed (e.g. a model that
+    doesn't stream), yields `fallback(final_state)` instead.
+    """
+    segments = {}
+    final_state = None
+    text = ""
+    events = graph.astream(graph_input, config=config, stream_mode=["messages", "values"], subgraphs=True)
+    async for namespace, mode, data in events:
+        if mode == "values":
+            if not namespace:
+                final_state = data
+            continue
+
+        message, metadata = data
+        if not isinstance(message, AIMessage) or metadata.get("langgraph_node") not in MODEL_NODES:
+            continue
+        chunk_text = _chunk_text(message)
+        if not chunk_text:
+            continue
+        # A model that doesn't stream sends its whole message once
+        if isinstance(message, AIMessageChunk):
+            segments[message.id] = segments.get(message.id, "") + chunk_text
+        else:
+            segments[message.id] = chunk_text
+
+        visible = [seg for seg in segments.values() if not is_internal_message(seg)]
+        if visible:
+            text = "\n\n".join(visible)
+            yield text
+
+    if not text and final_state is not None:
+        text = fallback(final_state)
+        if text:
+            yield text
+
+
+async def astream_routed_turn(session: SessionState, route, message, messages: list, thread_messages: list, config):
+    if PERSONA_REWRITE:
+        # The rewrite needs the whole answer first, so there is nothing to stream before it
+        yield await arun_routed_turn(session, route, message, messages, thread_messages, config)
+        return
+
+    answer = ""
+    agent = get_agent(route.agent)
+    # Only the agent's own model node: research, translation and summary calls inside its tools stay internal
+    async for answer in astream_reply(agent, agent_input(session, messages, thread_messages), config, final_answer):
+        yield answer
+    await arecord_turn(config, turn_update(session, messages, thread_messages, route.agent, answer))
+
+
+async def astream_chat_with_agent(message, history, request: gr.Request = None):
+    """Streaming chat handler. Yields the reply built so far as supervisor and agent tokens
+    arrive, so the user sees text after the first model hop instead of the whole graph run."""
+    session = sessions.get(session_id_from_request(request))
+    messages, reply = await aprepare_turn(session, message, history)
+    if reply is not None:
+        yield reply
+        return
+
+    config = supervisor_config(session)
+    thread_messages = await aload_thread(config, history)
+    route = route_message(message, session.craft_state)
+    cached = cached_reply(session, message, history, route)
+    if cached is not None:
+        await arecord_turn(config, turn_update(session, messages, thread_messages, "supervisor", cached))
+        yield cached
+        return
+
+    router_stats.record(route)
+    video_task = asyncio.create_task(aresolve_video_reply(session, messages))
+    if route is not None:
+        stream = astream_routed_turn(session, route, message, messages, thread_messages, config)
+    else:
+        stream = astream_reply(
+            get_supervisor(), supervisor_input(session, messages, thread_messages), config,
+            lambda response: filter_supervisor_response(response, history),
+        )
+
+    text = ""
+    async for text in stream:
+        yield text
+
+    session.context.schedule_summary(messages)
+    video_reply = await video_task
+    remember_reply(session, message, history, route, text)
+    if video_reply:
+        yield text + video_reply
+
+
+def handle_file_upload(file, request: gr.Request = None):
+    session = sessions.get(session_id_from_request(request))
+    # A replaced or cleared file makes any running analysis pointless
+    if session.analysis_job is not None:
+        cancel_analysis_job(session.analysis_job)
+        session.analysis_job = None
+
     if file:
-        uploaded_file_path["path"] = file.name        
-        state["media_processed"] = False
-        state["analysis_result"] = None
+        session.uploaded_file = file.name
+        session.media_processed = False
+        session.analysis_result = None
+        # Start analysing right away so the result is (nearly) ready by the next message
+        session.analysis_job = start_analysis_job(file.name)
         return "✅ File received. It will be considered in your next message."
     else:
-        uploaded_file_path["path"] = None
-        state["media_processed"] = True
-        state["analysis_result"] = None
+        session.uploaded_file = None
+        session.media_processed = True
+        session.analysis_result = None
         return "❌ File cleared."
 
 
@@ -229,7 +413,7 @@ with gr.Blocks(title="Craftwise", css=CUSTOM_CSS, theme=gr.themes.Soft()) as dem
             """)
     
     gr.ChatInterface(
-        fn=chat_with_agent,
+        fn=astream_chat_with_agent if STREAM_RESPONSES else achat_with_agent,
         title="",
         description="",
         theme=gr.themes.Soft(),
@@ -263,5 +447,7 @@ with gr.Blocks(title="Craftwise", css=CUSTOM_CSS, theme=gr.themes.Soft()) as dem
 
     file_input.change(fn=handle_file_upload, inputs=file_input, outputs=file_status)
 
+demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT)
+
 if __name__ == "__main__":
     demo.launch()
@@ -0,0 +1,64 @@
+"""
+Router benchmark: how often `route_message` sends a message straight to an agent, and how often that
+agent is the right one, on the labelled routing set.
+
+Messages labelled with an agent are clear requests for it; null marks messages the supervisor should
+keep (small talk, plans, mixed or underspecified requests). Precision is the share of routed messages
+that went to their labelled agent, coverage the share of labelled-agent messages that were routed.
+A misroute skips the supervisor entirely, so precision is what matters before enabling the router.
+
+Usage:
+    python benchmarks/router.py [--data benchmarks/data/routing_eval.jsonl] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+# Measure the rules whatever the local .env says
+os.environ["CRAFTWISE_ROUTER"] = "1"
+
+from agents.router import RULES, route_message  # noqa: E402
+
+DEFAULT_DATA = os.path.join(REPO_ROOT, "benchmarks", "data", "routing_eval.jsonl")
+
+
+def load_examples(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["text"], row["agent"]) for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="labelled JSONL routing set")
+    parser.add_argument("--verbose", action="store_true", help="list every misroute")
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    routes = [route_message(text) for text, _ in examples]
+    print(f"{len(examples)} labelled messages, {sum(agent is not None for _, agent in examples)} for a specific agent")
+    print()
+
+    for name in list(RULES) + [None]:
+        rows = [(route, agent) for route, (_, agent) in zip(routes, examples) if (route and route.agent) == name]
+        if name is None:
+            kept = len(rows)
+            print(f"{'supervisor':<22} kept {kept:>3}")
+            continue
+        correct = sum(route.agent == agent for route, agent in rows)
+        labelled = sum(agent == name for _, agent in examples)
+        precision = correct / len(rows) if rows else 1.0
+        print(f"{name:<22} routed {len(rows):>3}  precision {precision:>6.1%}  coverage {correct}/{labelled}")
+
+    routed = [(route, agent) for route, (_, agent) in zip(routes, examples) if route is not None]
+    correct = sum(route.agent == agent for route, agent in routed)
+    print()
+    print(f"overall precision {correct / len(routed) if routed else 1.0:.1%} on {len(routed)} routed messages")
+
+    if args.verbose:
+        for route, (text, agent) in zip(routes, examples):
+            if route is not None and route.agent != agent:
+                print(f"misrouted to {route.agent} on {route.reason!r} (labelled {agent}): {text!r}")
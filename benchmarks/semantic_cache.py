@@ -0,0 +1,72 @@
+"""
+Semantic cache benchmark: how often the response cache would reuse an answer for a labelled pair of
+opening questions, and how often that reuse would be wrong.
+
+Each pair is a paraphrase ("same": true) or a near miss that needs a different answer ("same": false).
+Precision is the share of reuses that were paraphrases, recall the share of paraphrases reused.
+Rows are printed for a few thresholds, with cosine similarity alone and with the content-word check
+that `response_cache` applies on top of it.
+
+Usage:
+    python benchmarks/semantic_cache.py [--data benchmarks/data/semantic_cache_pairs.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.semantic_cache import SemanticCache, content_terms, cosine, response_cache, text_vector  # noqa: E402
+
+DEFAULT_DATA = os.path.join(REPO_ROOT, "benchmarks", "data", "semantic_cache_pairs.jsonl")
+THRESHOLDS = (0.8, 0.85, 0.9, 0.95)
+
+
+def load_pairs(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["a"], row["b"], row["same"]) for row in rows]
+
+
+def reused(pairs: list, threshold: float, anchors=None) -> list:
+    """Whether a cache holding only `a` answers `b`, per pair."""
+    hits = []
+    for a, b, _ in pairs:
+        cache = SemanticCache(threshold=threshold, anchors=anchors)
+        cache.set(a, True)
+        hits.append(cache.get(b) is not None)
+    return hits
+
+
+def precision_recall(hits: list, pairs: list):
+    labels = [same for _, _, same in pairs]
+    true_hits = sum(hit and same for hit, same in zip(hits, labels))
+    precision = true_hits / sum(hits) if any(hits) else 1.0
+    return precision, true_hits / sum(labels), sum(hit and not same for hit, same in zip(hits, labels))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="labelled JSONL pairs")
+    parser.add_argument("--verbose", action="store_true", help="list the wrong reuses and missed paraphrases")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.data)
+    print(f"{len(pairs)} labelled pairs, {sum(same for _, _, same in pairs)} paraphrases "
+          f"(response_cache threshold {response_cache.threshold})")
+    print()
+    for threshold in THRESHOLDS:
+        for label, anchors in (("cosine only", None), ("cosine + words", content_terms)):
+            hits = reused(pairs, threshold, anchors)
+            precision, recall, wrong = precision_recall(hits, pairs)
+            print(f"threshold {threshold:.2f}  {label:<15} precision {precision:>6.1%}  recall {recall:>6.1%}  wrong answers {wrong}")
+
+    if args.verbose:
+        hits = reused(pairs, response_cache.threshold, response_cache.anchors)
+        print()
+        for hit, (a, b, same) in zip(hits, pairs):
+            if hit != same:
+                score = cosine(text_vector(a), text_vector(b))
+                print(f"{'wrong reuse' if hit else 'missed':<12} {score:.3f}  {a!r} / {b!r}")
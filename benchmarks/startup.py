@@ -0,0 +1,92 @@
+"""
+Startup benchmark for the Craftwise app.
+
+Reports per-module import cost (parsed from `python -X importtime`) and time-to-ready:
+how long `import app` takes until the Gradio UI is defined, and how long the first
+supervisor graph build takes on top of that.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--top 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Building clients doesn't talk to the network, but constructors refuse empty keys
+DUMMY_ENV = {
+    "GOOGLE_API_KEY": "benchmark",
+    "TAVILY_API_KEY": "benchmark",
+    "GOOGLE_MAPS_API_KEY": "AIzaBenchmarkBenchmarkBenchmarkBenchmark",
+    "YOUTUBE_API_KEY": "benchmark",
+}
+
+READY_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.get_supervisor()
+built = time.perf_counter()
+print(json.dumps({"import_app": imported - start, "first_graph": built - imported}))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    for key, value in DUMMY_ENV.items():
+        env.setdefault(key, value)
+    return env
+
+
+def import_times(top: int) -> list:
+    """Returns (cumulative_seconds, self_seconds, module) for the slowest top-level imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=REPO_ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        # Depth 0 is `app` itself and depth 1 its direct imports, so sibling times don't overlap
+        if depth <= 1:
+            rows.append((int(cumulative_us) / 1e6, int(self_us) / 1e6, name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def time_to_ready(runs: int) -> dict:
+    samples = {"import_app": [], "first_graph": []}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", READY_SCRIPT],
+            cwd=REPO_ROOT, env=_env(), capture_output=True, text=True, check=True,
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        for key, value in result.items():
+            samples[key].append(value)
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="number of cold starts to take the median over")
+    parser.add_argument("--top", type=int, default=20, help="number of modules to list")
+    args = parser.parse_args()
+
+    print(f"{'cumulative':>11} {'self':>9}  module")
+    for cumulative, own, name in import_times(args.top):
+        print(f"{cumulative:>10.3f}s {own:>8.3f}s  {name}")
+
+    ready = time_to_ready(args.runs)
+    print()
+    print(f"time to ready (import app):  {ready['import_app']:.3f}s  (median of {args.runs})")
+    print(f"first supervisor build:      {ready['first_graph']:.3f}s")
+    print(f"total to first request:      {ready['import_app'] + ready['first_graph']:.3f}s")
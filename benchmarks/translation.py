@@ -0,0 +1,39 @@
+"""
+Language check benchmark: accuracy of `looks_english`, which decides which search snippets skip
+translation, on labelled snippets in English and in languages that share its alphabet.
+
+A non-English snippet taken for English reaches the agents untranslated, so those are listed.
+
+Usage:
+    python benchmarks/translation.py [--data benchmarks/data/language_eval.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.translation import looks_english  # noqa: E402
+
+DEFAULT_DATA = os.path.join(REPO_ROOT, "benchmarks", "data", "language_eval.jsonl")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="labelled JSONL snippets")
+    args = parser.parse_args()
+
+    with open(args.data, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    predictions = [looks_english(row["text"]) for row in rows]
+
+    correct = sum(p == row["english"] for p, row in zip(predictions, rows))
+    english = sum(row["english"] for row in rows)
+    print(f"{len(rows)} labelled snippets, {english} in English")
+    print(f"accuracy {correct / len(rows):.1%}")
+    for p, row in zip(predictions, rows):
+        if p != row["english"]:
+            kind = "untranslated" if p else "translated needlessly"
+            print(f"{kind:<22} {row['text']!r}")
@@ -0,0 +1,85 @@
+"""
+Video intent benchmark: accuracy and latency of the local classifier against the LLM path
+on the labelled evaluation set.
+
+The local classifier answers confidently or defers to the LLM; its accuracy is reported on the
+messages it answered, and the hybrid row counts deferred messages as LLM answers. The LLM rows
+need a GOOGLE_API_KEY and are only run with --llm.
+
+Usage:
+    python benchmarks/video_intent.py [--data benchmarks/data/video_intent_eval.jsonl] [--llm]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.video_intent import get_video_intent_model, llm_video_intent, load_examples, local_video_intent  # noqa: E402
+
+DEFAULT_DATA = os.path.join(REPO_ROOT, "benchmarks", "data", "video_intent_eval.jsonl")
+
+
+def timed(classify, examples: list, repeat: int = 1):
+    """Returns the predictions and the per-message latencies in seconds (best of `repeat`)."""
+    predictions, latencies = [], []
+    for text, _ in examples:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            prediction = classify(text)
+            best = min(best, time.perf_counter() - start)
+        predictions.append(prediction)
+        latencies.append(best)
+    return predictions, latencies
+
+
+def accuracy(predictions: list, examples: list) -> float:
+    answered = [(p, label) for p, (_, label) in zip(predictions, examples) if p is not None]
+    return sum(p == label for p, label in answered) / len(answered) if answered else 0.0
+
+
+def _latency(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"median {statistics.median(ordered) * 1e6:>9.1f}µs  p99 {p99 * 1e6:>9.1f}µs"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="labelled JSONL evaluation set")
+    parser.add_argument("--repeat", type=int, default=20, help="timing repetitions per message for the local classifier")
+    parser.add_argument("--llm", action="store_true", help="also run the LLM path (needs API keys)")
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    get_video_intent_model()  # load the weights outside the timed loop
+
+    local, local_latencies = timed(local_video_intent, examples, args.repeat)
+    deferred = sum(p is None for p in local)
+    print(f"{len(examples)} labelled messages, {sum(label for _, label in examples)} asking for a video")
+    print()
+    print(f"local classifier  accuracy {accuracy(local, examples):>6.1%}  "
+          f"answered {len(examples) - deferred}/{len(examples)}  {_latency(local_latencies)}")
+
+    if args.llm:
+        from dotenv import load_dotenv
+        from utils.models import get_model
+
+        load_dotenv()
+        model = get_model("video_intent")
+        llm, llm_latencies = timed(lambda text: llm_video_intent(text, model), examples)
+        hybrid = [llm_answer if p is None else p for p, llm_answer in zip(local, llm)]
+        hybrid_latencies = [
+            local_latency + (llm_latency if p is None else 0.0)
+            for p, local_latency, llm_latency in zip(local, local_latencies, llm_latencies)
+        ]
+        print(f"LLM only          accuracy {accuracy(llm, examples):>6.1%}  "
+              f"calls {len(examples):>3}/{len(examples)}  {_latency(llm_latencies)}")
+        print(f"local + fallback  accuracy {accuracy(hybrid, examples):>6.1%}  "
+              f"calls {deferred:>3}/{len(examples)}  {_latency(hybrid_latencies)}")
+    else:
+        print(f"(run with --llm to compare against the LLM path; {deferred} message(s) would fall back to it)")
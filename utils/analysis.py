@@ -1,17 +1,26 @@
-import base64
 import json
-import mimetypes
+import os
 import re
-from langchain.chat_models import init_chat_model
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from langchain_core.messages import HumanMessage
 
+from utils.cache import TTLCache
+from utils.media import MediaTooLargeError, UnsupportedMediaError, file_sha256, guess_mime_type, prepare_media_parts
+from utils.models import get_model, model_name_for
 
-model = init_chat_model("gemini-2.0-flash", model_provider="google_genai")
+# Bump when the analysis prompt or preprocessing changes so cached results are not reused
+ANALYSIS_PROMPT_VERSION = 1
 
+analysis_cache = TTLCache(
+    maxsize=int(os.getenv("CRAFTWISE_ANALYSIS_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("CRAFTWISE_ANALYSIS_CACHE_TTL", str(30 * 24 * 3600))),
+    path=os.getenv("CRAFTWISE_ANALYSIS_CACHE_PATH"),
+)
 
-def _encode_file(file_path: str) -> str:
-    with open(file_path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
+
+def analysis_cache_key(file_path: str) -> str:
+    return f"{file_sha256(file_path)}:v{ANALYSIS_PROMPT_VERSION}:{model_name_for('analysis')}"
 
 
 def safe_json_parse(obj):
@@ -39,7 +48,7 @@ def extract_json(response: str) -> dict:
 
 
 
-def analyze_media_structured(file_path: str) -> str:
+def analyze_media_structured(file_path: str, stop: threading.Event = None) -> str:
     """
     Analyze the uploaded image or video of a craft project.
 
@@ -53,12 +62,36 @@ def analyze_media_structured(file_path: str) -> str:
     Return a structured dictionary with specific observations.
     Avoid general encouragement or introductions.
     Do not refer to yourself or the tool.
+
+    Returns None without calling the model if `stop` is set by the time preprocessing is done.
     """
-    mime_type, _ = mimetypes.guess_type(file_path)
+    # Checked before encoding, so a repeated upload costs one pass of hashing and nothing else
+    key = analysis_cache_key(file_path)
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        return cached
+
+    content = _build_media_content(file_path)
+    if isinstance(content, dict):
+        # The chat shows this as the reply, so hand back the message rather than the dict
+        return content["error"]
+    if stop is not None and stop.is_set():
+        return None
+
+    response = get_model("analysis").invoke([HumanMessage(content=content)]).content
+    analysis_cache.set(key, response)
+
+    try:
+        return response
+    except Exception:
+        return "Failed to load response from media analysis"
+
+
+def _build_media_content(file_path: str):
+    mime_type = guess_mime_type(file_path)
     if not mime_type:
         return {"error": "Unsupported file type."}
 
-    encoded = _encode_file(file_path)
     prompt = f"""
     You are a craft analysis assistant. The user uploaded a {mime_type} of their craft project.
     Please return your observations on the following points:
@@ -72,22 +105,33 @@ def analyze_media_structured(file_path: str) -> str:
     Return the comments as a string.
     """
 
-    if mime_type.startswith("video"):
-        content = [
-            {"type": "text", "text": prompt},
-            {"type": "media", "data": encoded, "mime_type": mime_type},
-        ]
-    elif mime_type.startswith("image"):
-        content = [
-            {"type": "text", "text": prompt},
-            {"type": "image_url", "image_url": f"data:{mime_type};base64,{encoded}"},
-        ]
-    else:
-        return {"error": "Unsupported media type."}
-
-    response = model.invoke([HumanMessage(content=content)]).content
-
     try:
-        return response
-    except Exception:
-        return "Failed to load response from media analysis"
\ No newline at end of file
+        return [{"type": "text", "text": prompt}] + prepare_media_parts(file_path, mime_type)
+    except (MediaTooLargeError, UnsupportedMediaError) as e:
+        return {"error": str(e)}
+
+
+_analysis_pool = None
+_analysis_pool_lock = threading.Lock()
+
+
+def start_analysis_job(file_path: str) -> Future:
+    """Starts `analyze_media_structured` on a background worker and returns its future.
+    Stop it with `cancel_analysis_job`."""
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            _analysis_pool = ThreadPoolExecutor(
+                max_workers=int(os.getenv("CRAFTWISE_ANALYSIS_WORKERS", "4")),
+                thread_name_prefix="media-analysis",
+            )
+    stop = threading.Event()
+    job = _analysis_pool.submit(analyze_media_structured, file_path, stop)
+    job.stop = stop
+    return job
+
+
+def cancel_analysis_job(job: Future) -> None:
+    """Future.cancel() only drops a job that hasn't started; a running one skips its model call."""
+    job.cancel()
+    job.stop.set()
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+# "memory" (default, single node), "sqlite" (persists across restarts) or "none" (replay history every turn)
+CHECKPOINTER = os.getenv("CRAFTWISE_CHECKPOINTER", "memory")
+CHECKPOINT_PATH = os.getenv("CRAFTWISE_CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
+MAX_THREADS = int(os.getenv("CRAFTWISE_CHECKPOINT_MAX_THREADS", "1000"))
+
+
+class LRUMemorySaver(InMemorySaver):
+    """In-memory checkpointer that keeps at most `max_threads` conversations, dropping the least recently used."""
+
+    def __init__(self, max_threads: int = MAX_THREADS):
+        super().__init__()
+        self.max_threads = max_threads
+        self._threads = OrderedDict()
+        self._lru_lock = threading.Lock()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        with self._lru_lock:
+            self._threads[thread_id] = True
+            self._threads.move_to_end(thread_id)
+            evicted = []
+            while len(self._threads) > self.max_threads:
+                evicted.append(self._threads.popitem(last=False)[0])
+        for old_thread in evicted:
+            self.delete_thread(old_thread)
+        return result
+
+
+def _threaded_sqlite_saver(path: str):
+    """
+    SqliteSaver only implements the sync interface. The app drives the graph with
+    ainvoke/astream, so run the sync methods on worker threads.
+    """
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    class ThreadedSqliteSaver(SqliteSaver):
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return ThreadedSqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+
+def checkpointing_enabled() -> bool:
+    return CHECKPOINTER != "none"
+
+
+def get_checkpointer():
+    if CHECKPOINTER == "none":
+        return None
+    if CHECKPOINTER == "sqlite":
+        return _threaded_sqlite_saver(CHECKPOINT_PATH)
+    return LRUMemorySaver()
@@ -0,0 +1,148 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage, trim_messages
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableConfig
+
+from utils.models import get_model
+
+# Turns (user + assistant message pairs) that are always kept verbatim
+KEEP_TURNS = int(os.getenv("CRAFTWISE_CONTEXT_TURNS", "4"))
+
+# Rough token budget per consumer of the conversation
+TOKEN_BUDGETS = {
+    "supervisor": int(os.getenv("CRAFTWISE_SUPERVISOR_TOKEN_BUDGET", "4000")),
+}
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+summary_prompt = PromptTemplate.from_template("""
+You maintain a running summary of a conversation between a user and Craftwise, a craft mentor.
+Update the summary with the new messages. Keep what matters for later turns: the craft, the project,
+the user's experience level and location, supplies, decisions made and open questions.
+Write at most 120 words, no introduction.
+
+Current summary:
+{summary}
+
+New messages:
+{conversation}
+""")
+
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-summary")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(text) // 4 + 1
+
+
+def _format(messages: list) -> str:
+    return "\n".join(
+        f"{'User' if isinstance(msg, HumanMessage) else 'Assistant'}: {msg.content}"
+        for msg in messages
+    )
+
+
+class ConversationContext:
+    """
+    Bounded view of a conversation: the last `keep_turns` turns verbatim plus a summary of
+    everything older. The summary is updated incrementally, folding in only the messages that
+    fell out of the window since the last update, and off the request path.
+    """
+
+    def __init__(self, keep_turns: int = KEEP_TURNS):
+        self.keep_turns = keep_turns
+        self.summary = ""
+        # How many leading messages of the conversation the summary already covers
+        self.summarized = 0
+        self._lock = threading.Lock()
+        self._updating = False
+
+    def _window_start(self, messages: list) -> int:
+        # The newest message is the user's current one, it always stays
+        return max(0, len(messages) - 2 * self.keep_turns - 1)
+
+    def window(self, messages: list, consumer: str) -> list:
+        """The messages to send to `consumer`, within its token budget."""
+        budget = TOKEN_BUDGETS[consumer]
+        with self._lock:
+            summary, summarized = self.summary, min(self.summarized, len(messages))
+
+        # Messages that dropped out of the window but aren't summarised yet stay verbatim while they fit
+        recent = messages[summarized:]
+        if summary:
+            budget -= estimate_tokens(summary)
+
+        kept = []
+        for msg in reversed(recent):
+            cost = estimate_tokens(str(msg.content))
+            if kept and cost > budget:
+                break
+            kept.append(msg)
+            budget -= cost
+        kept.reverse()
+
+        if summary:
+            return [HumanMessage(content=SUMMARY_PREFIX + summary)] + kept
+        return kept
+
+    def schedule_summary(self, messages: list) -> None:
+        """Folds messages that left the verbatim window into the summary on a background worker."""
+        start = self._window_start(messages)
+        with self._lock:
+            if start < self.summarized:
+                # The history got shorter (e.g. a retried message); start over
+                self.summary, self.summarized = "", 0
+            if self._updating or start <= self.summarized:
+                return
+            self._updating = True
+            new_messages = messages[self.summarized:start]
+
+        _summary_pool.submit(self._update_summary, new_messages, start)
+
+    def _update_summary(self, new_messages: list, covered: int) -> None:
+        try:
+            prompt = summary_prompt.format(summary=self.summary or "(none yet)", conversation=_format(new_messages))
+            summary = get_model("summary").invoke([HumanMessage(content=prompt)]).content
+            with self._lock:
+                self.summary, self.summarized = summary.strip(), covered
+        except Exception as e:
+            print(f"Conversation summary update failed: {e}")
+        finally:
+            with self._lock:
+                self._updating = False
+
+
+def _count_tokens(messages: list) -> int:
+    return sum(estimate_tokens(str(msg.content)) for msg in messages)
+
+
+def bounded_model_input(state: dict, config: RunnableConfig = None) -> dict:
+    """
+    Pre-model hook for agents compiled with a checkpointer. The checkpointed thread keeps
+    growing, so only its most recent messages (within the supervisor budget) go to the model,
+    after the running summary of the session's ConversationContext when the caller passes it
+    as `conversation_context` (an object, so it isn't copied into every checkpoint's metadata).
+    """
+    messages = state["messages"]
+    kept = trim_messages(
+        messages,
+        strategy="last",
+        token_counter=_count_tokens,
+        max_tokens=TOKEN_BUDGETS["supervisor"],
+        start_on="human",
+        allow_partial=False,
+    )
+    if not kept:
+        # The current turn alone is over budget; it still has to go through whole
+        last_human = max((i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)), default=0)
+        kept = messages[last_human:]
+
+    context = ((config or {}).get("configurable") or {}).get("conversation_context")
+    summary = context.summary if context is not None else ""
+    if summary and len(kept) < len(messages):
+        kept = [HumanMessage(content=SUMMARY_PREFIX + summary)] + kept
+    return {"llm_input_messages": kept}
@@ -0,0 +1,110 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class SupplyItem(BaseModel):
+    """One line of a supply list, priced as found in a shop."""
+
+    name: str = Field(description="Item name, e.g. silk yarn")
+    quantity: float = Field(description="How much of the item the project needs, e.g. 300")
+    unit: str = Field(default="pcs", description="Unit of the quantity, e.g. g, kg, m, yd, pcs, skein")
+    unit_price: Optional[float] = Field(default=None, description="Price found in the shop; leave empty if unknown")
+    price_per: float = Field(default=1, gt=0, description="How many price units the price covers, e.g. 100 for '5 EUR per 100 g'")
+    price_unit: Optional[str] = Field(default=None, description="Unit the price refers to, defaults to `unit`")
+    currency: str = Field(default="EUR", description="Currency code or symbol of the price, e.g. EUR, USD, €, лв")
+
+
+# Conversion factors to a base unit per dimension
+UNITS = {
+    "g": ("mass", 1), "gram": ("mass", 1), "grams": ("mass", 1),
+    "kg": ("mass", 1000), "oz": ("mass", 28.3495), "lb": ("mass", 453.592), "lbs": ("mass", 453.592),
+    "mm": ("length", 0.001), "cm": ("length", 0.01), "m": ("length", 1), "meter": ("length", 1),
+    "meters": ("length", 1), "in": ("length", 0.0254), "inch": ("length", 0.0254),
+    "ft": ("length", 0.3048), "yd": ("length", 0.9144), "yard": ("length", 0.9144), "yards": ("length", 0.9144),
+    "ml": ("volume", 0.001), "l": ("volume", 1),
+}
+
+# Spellings of "pieces"; other count units (skein, ball, sheet) just drop their plural
+COUNT_UNITS = {"pc": "pcs", "pcs": "pcs", "piece": "pcs", "pieces": "pcs", "pz": "pcs", "stk": "pcs"}
+
+CURRENCY_SYMBOLS = {"€": "EUR", "$": "USD", "£": "GBP", "лв": "BGN", "лв.": "BGN", "¥": "JPY", "zł": "PLN"}
+
+# Approximate rates to EUR; good enough for a project estimate, not for accounting
+RATES_TO_EUR = {
+    "EUR": 1.0, "USD": 0.92, "GBP": 1.17, "BGN": 0.511, "JPY": 0.0061, "PLN": 0.23,
+    "CHF": 1.04, "CAD": 0.68, "AUD": 0.61, "SEK": 0.088, "DKK": 0.134, "RON": 0.2, "MKD": 0.0163,
+}
+
+
+def normalize_currency(currency: str) -> str:
+    currency = currency.strip()
+    return CURRENCY_SYMBOLS.get(currency.lower(), CURRENCY_SYMBOLS.get(currency, currency.upper()))
+
+
+def convert_currency(amount: float, currency: str, target: str) -> Optional[float]:
+    source, target = normalize_currency(currency), normalize_currency(target)
+    if source == target:
+        return amount
+    if source not in RATES_TO_EUR or target not in RATES_TO_EUR:
+        return None
+    return amount * RATES_TO_EUR[source] / RATES_TO_EUR[target]
+
+
+def _unit_factor(unit: str):
+    return UNITS.get(unit.strip().lower().rstrip("."))
+
+
+def _count_unit(unit: str) -> str:
+    unit = unit.strip().lower().rstrip(".")
+    if unit in COUNT_UNITS:
+        return COUNT_UNITS[unit]
+    if unit.endswith(("xes", "ches", "shes")):
+        return unit[:-2]
+    if unit.endswith("s") and not unit.endswith("ss") and len(unit) > 3:
+        return unit[:-1]
+    return unit
+
+
+def priced_units(item: SupplyItem) -> Optional[float]:
+    """How many `price_per`-sized price units the needed quantity amounts to, or None if the units don't match."""
+    price_unit = item.price_unit or item.unit
+    needed, priced = _unit_factor(item.unit), _unit_factor(price_unit)
+    if needed is None or priced is None:
+        # Count-like units (pcs, skein, ball) only convert to themselves, singular or plural
+        if _count_unit(item.unit) != _count_unit(price_unit):
+            return None
+        return item.quantity / item.price_per
+    if needed[0] != priced[0]:
+        return None
+    return item.quantity * needed[1] / (priced[1] * item.price_per)
+
+
+def calculate_costs(items: list, currency: str = "EUR") -> dict:
+    """Returns per-item costs converted to `currency`, the total, and the items that couldn't be priced."""
+    currency = normalize_currency(currency)
+    lines, unpriced = [], []
+    total = 0.0
+    for item in items:
+        if item.unit_price is None:
+            unpriced.append({"name": item.name, "reason": "no price found"})
+            continue
+        units = priced_units(item)
+        if units is None:
+            unpriced.append({"name": item.name, "reason": f"can't convert {item.unit} to {item.price_unit or item.unit}"})
+            continue
+        cost = convert_currency(units * item.unit_price, item.currency, currency)
+        if cost is None:
+            unpriced.append({"name": item.name, "reason": f"unknown currency {item.currency}"})
+            continue
+        lines.append({"name": item.name, "quantity": item.quantity, "unit": item.unit, "cost": round(cost, 2)})
+        total += cost
+    return {"currency": currency, "items": lines, "total": round(total, 2), "unpriced": unpriced}
+
+
+def format_costs(costs: dict) -> str:
+    currency = costs["currency"]
+    output = [f"• {line['name']} ({line['quantity']:g} {line['unit']}): {line['cost']:.2f} {currency}" for line in costs["items"]]
+    for item in costs["unpriced"]:
+        output.append(f"• {item['name']}: price unknown ({item['reason']})")
+    output.append(f"Estimated total: {costs['total']:.2f} {currency}")
+    return "\n".join(output)
@@ -0,0 +1,159 @@
+import re
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field
+
+from utils.models import get_model
+from utils.state import CraftState
+from utils.video_intent import allm_video_intent, local_video_intent
+
+
+class TurnIntent(BaseModel):
+    """Everything we need to know about the user's request, extracted in a single model call."""
+
+    project: str = Field(default="", description="What the user wants to create or work on, e.g. paper crane, knitted scarf")
+    craft: str = Field(default="", description="The type of craft involved, e.g. origami, knitting, crochet")
+    experience_level: str = Field(default="", description='One of "beginner", "intermediate", "advanced", or "" if unclear')
+    query: str = Field(default="", description="What the user is looking for, 3 words max, e.g. knitting or how to cast on")
+    asked_for_video: bool = Field(default=False, description="True only if the latest user message explicitly asks for a video tutorial")
+
+
+intent_prompt = PromptTemplate.from_template("""
+You are an assistant that keeps track of what a user wants from a craft mentor.
+Below is what is known so far and the latest turn of the conversation. Update the following fields:
+1. project – what the user wants to create or work on (e.g., paper crane, knitted scarf)
+2. craft – what type of craft it involves (e.g., origami, knitting, crochet)
+3. experience_level – the user's skill level (one of beginner, intermediate, advanced, or ""). If you cannot classify as beginner, intermediate, advanced, return empty string as a value
+4. query - this refers to what the user is actually looking for, it can be the project itself (e.g. knitting) or a specific technique related to it (e.g. how to cast on). Return the query as 3 words max.
+5. asked_for_video - true if the latest user message explicitly asks for a video tutorial, otherwise false.
+Return a field empty if the latest turn doesn't change it.
+
+Known so far:
+{state}
+
+Latest turn:
+{conversation}
+""")
+
+# Only the end of the assistant's previous reply is needed to make sense of the user's answer
+PREVIOUS_REPLY_CHARS = 600
+
+# Word stems that hint at new craft, project, level or video information in a message
+CRAFT_STEMS = (
+    "knit", "crochet", "origami", "kirigami", "quilt", "embroider", "stitch", "sew", "lace", "tatting",
+    "bobbin", "weav", "loom", "spinning", "yarn", "needle", "pottery", "ceramic", "clay", "macrame",
+    "felt", "calligraph", "woodwork", "carv", "bead", "jewel", "paint", "watercolo", "candle", "soap",
+    "leather", "scrapbook", "batik", "dye", "mosaic", "amigurumi", "resin", "papercraft", "fabric",
+)
+PROJECT_STEMS = (
+    "make", "making", "creat", "build", "learn", "start", "begin", "try", "want", "plan", "project",
+    "idea", "instead", "switch", "gift", "pattern",
+)
+LEVEL_STEMS = (
+    "beginner", "novice", "never", "first", "intermediate", "advanced", "expert", "experienc",
+    "year", "amateur", "professional",
+)
+VIDEO_STEMS = ("video", "youtube", "watch", "tutorial", "clip")
+# The same cues in the other languages users write in that mostly fit in ASCII (Spanish, Portuguese,
+# French, Italian, German); messages with other letters are always extracted
+OTHER_STEMS = (
+    "tej", "ganchill", "bordad", "bordar", "costur", "tricot", "maglia", "uncinett", "ricam", "strick",
+    "quier", "quer", "hacer", "fazer", "faire", "fare", "machen", "proyect", "projet", "progett",
+    "projekt", "aprend", "apprend", "impar", "lern", "principiante", "iniciante", "debutant", "anfang",
+)
+NEW_INFO_STEMS = CRAFT_STEMS + PROJECT_STEMS + LEVEL_STEMS + VIDEO_STEMS + OTHER_STEMS
+
+# Replies that never carry new information on their own
+ACKNOWLEDGEMENTS = {
+    "thanks", "thank", "you", "ok", "okay", "yes", "yeah", "no", "sure", "great", "cool", "nice",
+    "awesome", "perfect", "wow", "good", "sounds", "bye", "hi", "hello", "hey", "lol", "much", "a", "lot",
+}
+
+
+def format_conversation(messages: list) -> str:
+    return "\n".join(
+        f"{'User' if isinstance(msg, HumanMessage) else 'Assistant'}: {msg.content}"
+        for msg in messages
+    )
+
+
+def _intent_chain(model: Runnable) -> Runnable:
+    return model.with_structured_output(TurnIntent)
+
+
+def latest_turn(messages: list) -> list:
+    """The user's newest message and the assistant reply it answers, however long the conversation is."""
+    turn = messages[-1:]
+    if len(messages) > 1 and isinstance(messages[-2], AIMessage):
+        reply = str(messages[-2].content)[-PREVIOUS_REPLY_CHARS:]
+        turn = [AIMessage(content=reply)] + turn
+    return turn
+
+
+def format_state(state: CraftState) -> str:
+    return "\n".join(
+        f"{name}: {getattr(state, name) or '(unknown)'}"
+        for name in ("project", "craft", "experience_level", "query")
+    )
+
+
+def has_new_information(state: CraftState, turn: list) -> bool:
+    """
+    Cheap local check whether the latest turn may change the state. Until the craft and project are
+    known every message is extracted (many users never state their level, so it isn't waited for).
+    After that, acknowledgements and small talk are skipped; messages mentioning crafts, projects,
+    skill or videos are not, nor is anything outside the languages the cue words cover.
+    """
+    message = str(turn[-1].content)
+    words = re.findall(r"\w+", message.lower())
+    if not words:
+        return False
+    if not (state.project and state.craft):
+        return True
+    if all(word in ACKNOWLEDGEMENTS for word in words):
+        return False
+    return not message.isascii() or any(word.startswith(NEW_INFO_STEMS) for word in words)
+
+
+def _intent_prompt(state: CraftState, turn: list) -> str:
+    return intent_prompt.format(state=format_state(state), conversation=format_conversation(turn))
+
+
+async def aextract_turn_intent(state: CraftState, messages: list, model: Runnable) -> TurnIntent:
+    prompt = _intent_prompt(state, latest_turn(messages))
+    try:
+        return await _intent_chain(model).ainvoke([HumanMessage(content=prompt)]) or TurnIntent()
+    except Exception as e:
+        print(f"Intent extraction failed: {e}")
+        return TurnIntent()
+
+
+def apply_intent(state: CraftState, intent: TurnIntent) -> CraftState:
+    """Merges the extracted fields into the state; empty fields keep what was known before."""
+    for name in ("project", "craft", "query"):
+        value = getattr(intent, name).strip()
+        if value:
+            setattr(state, name, value)
+    if intent.experience_level.strip().lower() in ("beginner", "intermediate", "advanced"):
+        state.experience_level = intent.experience_level.strip().lower()
+    state.asked_for_video = intent.asked_for_video
+    return state
+
+
+async def aupdate_craft_state(state: CraftState, messages: list, model: Runnable) -> CraftState:
+    """Brings the state up to date with the latest turn, skipping the model call when nothing new was said.
+    Video intent comes from the local classifier; the model is only asked when it's unsure."""
+    turn = latest_turn(messages)
+    message = str(turn[-1].content)
+    asked_for_video = local_video_intent(message)
+    if has_new_information(state, turn):
+        state = apply_intent(state, await aextract_turn_intent(state, messages, model))
+        # The extraction call already answered the ambiguous case
+        if asked_for_video is None:
+            asked_for_video = state.asked_for_video
+    elif asked_for_video is None:
+        asked_for_video = await allm_video_intent(message, get_model("video_intent"))
+    state.asked_for_video = asked_for_video
+    return state
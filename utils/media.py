@@ -0,0 +1,210 @@
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+
+# Gemini accepts up to ~20 MB of inline data per request
+MAX_IMAGE_BYTES = int(os.getenv("CRAFTWISE_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+MAX_VIDEO_BYTES = int(os.getenv("CRAFTWISE_MAX_VIDEO_BYTES", str(20 * 1024 * 1024)))
+
+# Multiple of 3 so every chunk encodes to base64 without padding
+CHUNK_SIZE = 3 * 256 * 1024
+
+
+class MediaTooLargeError(ValueError):
+    pass
+
+
+class UnsupportedMediaError(ValueError):
+    pass
+
+
+def guess_mime_type(file_path: str):
+    mime_type, _ = mimetypes.guess_type(file_path)
+    return mime_type
+
+
+def size_limit_for(mime_type: str) -> int:
+    return MAX_VIDEO_BYTES if mime_type.startswith("video") else MAX_IMAGE_BYTES
+
+
+def check_size(file_path: str, mime_type: str) -> int:
+    size = os.path.getsize(file_path)
+    limit = size_limit_for(mime_type)
+    if size > limit:
+        raise MediaTooLargeError(
+            f"File is too large ({size / 1024 / 1024:.1f} MB); the limit is {limit / 1024 / 1024:.1f} MB."
+        )
+    return size
+
+
+def iter_base64_chunks(file_path: str, chunk_size: int = CHUNK_SIZE):
+    """Yields the base64 encoding of a file piece by piece without reading it all into memory."""
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield base64.b64encode(chunk)
+
+
+def file_sha256(file_path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Hashes a file in fixed-size chunks, so large uploads are never read in one go."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_file_base64(file_path: str) -> str:
+    """
+    Base64-encodes a file in fixed-size chunks into one preallocated buffer, so the raw file
+    is never held in memory next to its encoding.
+    """
+    size = os.path.getsize(file_path)
+    buffer = bytearray(4 * ((size + 2) // 3))
+    offset = 0
+    for encoded in iter_base64_chunks(file_path):
+        buffer[offset:offset + len(encoded)] = encoded
+        offset += len(encoded)
+    # Decoded through a view, so the buffer isn't copied once more before it becomes a str
+    return str(memoryview(buffer)[:offset], "ascii")
+
+
+def media_part(file_path: str, mime_type: str = None) -> dict:
+    """Builds the LangChain content block for an image or video, enforcing the size limits."""
+    mime_type = mime_type or guess_mime_type(file_path)
+    if not mime_type or not (mime_type.startswith("image") or mime_type.startswith("video")):
+        raise UnsupportedMediaError("Unsupported media type.")
+
+    check_size(file_path, mime_type)
+    encoded = encode_file_base64(file_path)
+    if mime_type.startswith("video"):
+        return {"type": "media", "data": encoded, "mime_type": mime_type}
+    return {"type": "image_url", "image_url": f"data:{mime_type};base64,{encoded}"}
+
+
+# Preprocessing: shrink what we send before encoding it
+MAX_IMAGE_DIMENSION = int(os.getenv("CRAFTWISE_MAX_IMAGE_DIMENSION", "1536"))
+JPEG_QUALITY = int(os.getenv("CRAFTWISE_JPEG_QUALITY", "85"))
+# "keyframes" sends sampled frames, "reencode" a smaller video, "original" the upload as is
+VIDEO_MODE = os.getenv("CRAFTWISE_VIDEO_MODE", "keyframes")
+MAX_KEYFRAMES = int(os.getenv("CRAFTWISE_MAX_KEYFRAMES", "8"))
+REENCODE_BITRATE = os.getenv("CRAFTWISE_REENCODE_BITRATE", "800k")
+
+
+def _image_block(data: bytes, mime_type: str = "image/jpeg") -> dict:
+    return {"type": "image_url", "image_url": f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"}
+
+
+def downscale_image(file_path: str, max_dimension: int = MAX_IMAGE_DIMENSION, quality: int = JPEG_QUALITY):
+    """Returns the image resized to fit `max_dimension` and recompressed as JPEG, or None if
+    Pillow can't read it or the result wouldn't be smaller than the original."""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(file_path) as image:
+            # draft() lets the JPEG decoder skip resolution we're about to throw away
+            image.draft("RGB", (max_dimension, max_dimension))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            image.thumbnail((max_dimension, max_dimension))
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+    except OSError:
+        return None
+
+    data = output.getvalue()
+    return data if len(data) < os.path.getsize(file_path) else None
+
+
+def _video_duration(file_path: str):
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file_path],
+            capture_output=True, text=True, timeout=30,
+        )
+        return float(result.stdout.strip())
+    except (subprocess.TimeoutExpired, OSError, ValueError):
+        return None
+
+
+def extract_keyframes(file_path: str, max_frames: int = MAX_KEYFRAMES, max_dimension: int = MAX_IMAGE_DIMENSION) -> list:
+    """Samples up to `max_frames` evenly spaced JPEG frames with a local ffmpeg. Empty if ffmpeg is unavailable."""
+    if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+        return []
+    duration = _video_duration(file_path)
+    if not duration:
+        return []
+
+    scale = f"scale='min({max_dimension},iw)':'min({max_dimension},ih)':force_original_aspect_ratio=decrease"
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            subprocess.run(
+                ["ffmpeg", "-v", "error", "-i", file_path,
+                 "-vf", f"fps={max_frames / duration},{scale}",
+                 "-frames:v", str(max_frames), "-q:v", "4", os.path.join(tmp, "frame_%03d.jpg")],
+                capture_output=True, timeout=120,
+            )
+        except (subprocess.TimeoutExpired, OSError):
+            return []
+        frames = []
+        for name in sorted(os.listdir(tmp)):
+            with open(os.path.join(tmp, name), "rb") as f:
+                frames.append(f.read())
+    return frames
+
+
+def reencode_video(file_path: str, bitrate: str = REENCODE_BITRATE, max_dimension: int = MAX_IMAGE_DIMENSION):
+    """Re-encodes a video to a lower bitrate MP4 with a local ffmpeg. Returns the bytes, or None on failure."""
+    if not shutil.which("ffmpeg"):
+        return None
+
+    scale = f"scale='min({max_dimension},iw)':-2"
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "small.mp4")
+        try:
+            result = subprocess.run(
+                ["ffmpeg", "-v", "error", "-i", file_path, "-vf", scale, "-b:v", bitrate,
+                 "-c:v", "libx264", "-preset", "veryfast", "-an", output_path],
+                capture_output=True, timeout=300,
+            )
+        except (subprocess.TimeoutExpired, OSError):
+            return None
+        if result.returncode != 0 or not os.path.exists(output_path):
+            return None
+        if os.path.getsize(output_path) >= os.path.getsize(file_path):
+            return None
+        with open(output_path, "rb") as f:
+            return f.read()
+
+
+def prepare_media_parts(file_path: str, mime_type: str = None) -> list:
+    """
+    Content blocks for an upload after local preprocessing: images are downscaled and
+    recompressed, videos become a handful of keyframes or a lower-bitrate copy depending on
+    CRAFTWISE_VIDEO_MODE. Falls back to the original file (with size limits) whenever
+    preprocessing isn't possible.
+    """
+    mime_type = mime_type or guess_mime_type(file_path)
+    if mime_type and mime_type.startswith("image"):
+        data = downscale_image(file_path)
+        if data is not None:
+            return [_image_block(data)]
+
+    elif mime_type and mime_type.startswith("video"):
+        if VIDEO_MODE == "keyframes":
+            frames = extract_keyframes(file_path)
+            if frames:
+                note = {"type": "text", "text": f"The video is shown as {len(frames)} frames sampled evenly from start to end."}
+                return [note] + [_image_block(frame) for frame in frames]
+        elif VIDEO_MODE == "reencode":
+            data = reencode_video(file_path)
+            if data is not None:
+                return [{"type": "media", "data": base64.b64encode(data).decode("ascii"), "mime_type": "video/mp4"}]
+
+    return [media_part(file_path, mime_type)]
@@ -0,0 +1,35 @@
+import os
+import threading
+
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+DEFAULT_PROVIDER = "google_genai"
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def model_name_for(role: str) -> str:
+    # Read at call time so values from .env (loaded after import) are respected
+    default = os.getenv("CRAFTWISE_MODEL", DEFAULT_MODEL)
+    return os.getenv(f"CRAFTWISE_MODEL_{role.upper()}", default)
+
+
+def get_model(role: str = "default", **kwargs):
+    """
+    Returns the chat model for a role. Clients are created on first use and shared between
+    every role that resolves to the same model name and settings, so agents reuse one
+    connection pool instead of each building their own.
+    """
+    name = model_name_for(role)
+    provider = os.getenv("CRAFTWISE_MODEL_PROVIDER", DEFAULT_PROVIDER)
+    key = (name, provider, tuple(sorted(kwargs.items())))
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                from langchain.chat_models import init_chat_model
+                client = init_chat_model(name, model_provider=provider, **kwargs)
+                _clients[key] = client
+    return client
@@ -0,0 +1,102 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Bump when the research pipeline or its prompts change so old summaries are ignored
+RESEARCH_STORE_VERSION = 2
+
+
+def normalize_craft(craft: str) -> str:
+    return " ".join(craft.lower().strip(" .!?").split())
+
+
+class ResearchStore:
+    """
+    On-disk store of researched craft summaries, keyed on the normalised craft name.
+
+    Entries younger than `ttl` are fresh. Older entries are still served for up to `max_age`
+    seconds, but callers are told they're stale so they can refresh them in the background.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_age: float = 90 * 24 * 3600,
+                 version: int = RESEARCH_STORE_VERSION):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.version = version
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="research-refresh")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS research (
+                craft TEXT PRIMARY KEY,
+                version INTEGER,
+                summary TEXT,
+                sources TEXT,
+                updated REAL
+            )"""
+        )
+        self._db.commit()
+
+    def get(self, craft: str):
+        """Returns (summary, sources, is_stale), or None if there is no usable entry."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, sources, updated FROM research WHERE craft = ? AND version = ?",
+                (normalize_craft(craft), self.version),
+            ).fetchone()
+        if row is None:
+            return None
+
+        age = time.time() - row[2]
+        if age > self.max_age:
+            return None
+        return row[0], json.loads(row[1]), age > self.ttl
+
+    def put(self, craft: str, summary: str, sources: list = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO research (craft, version, summary, sources, updated) VALUES (?, ?, ?, ?, ?)",
+                (normalize_craft(craft), self.version, summary, json.dumps(sources or []), time.time()),
+            )
+            self._db.commit()
+
+    def refresh_in_background(self, craft: str, research) -> None:
+        """Re-runs `research(craft) -> (summary, sources)` on a worker thread, once per craft at a time."""
+        key = normalize_craft(craft)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                summary, sources = research(craft)
+                # An empty search keeps the stale entry rather than replacing it with nothing
+                if sources:
+                    self.put(craft, summary, sources)
+            except Exception as e:
+                print(f"Background research refresh for '{craft}' failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+
+_store = None
+
+
+def get_research_store() -> ResearchStore:
+    global _store
+    if _store is None:
+        _store = ResearchStore(
+            path=os.getenv("CRAFTWISE_RESEARCH_STORE_PATH", ".cache/research.sqlite"),
+            ttl=float(os.getenv("CRAFTWISE_RESEARCH_TTL", str(7 * 24 * 3600))),
+        )
+    return _store
@@ -1,26 +1,127 @@
 import os
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 
+from utils.cache import TTLCache
+
+
+YOUTUBE_SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
+
+VIDEO_NOT_FOUND = "No video found for this query."
+SEARCH_FAILED = "YouTube search failed."
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class YouTubeSearchClient:
+    """
+    YouTube search over a pooled keep-alive session with explicit timeouts.
+
+    Results are cached on the normalised query, so repeated lookups such as
+    "knitting beginner cast on" skip the API entirely. Failed requests are never cached.
+    """
+
+    def __init__(self, api_key: str = None, timeout: float = 10.0, connect_timeout: float = 3.0,
+                 cache: TTLCache = None, pool_size: int = 10):
+        self.api_key = api_key
+        self.timeout = (connect_timeout, timeout)
+        self.cache = cache if cache is not None else TTLCache(maxsize=1024, ttl=24 * 3600)
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._async_client = None
+        self._pool_size = pool_size
+
+    def search(self, query: str) -> str:
+        """
+        Searches YouTube for a relevant video tutorial and returns the URL of the top result.
+        """
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self._session.get(YOUTUBE_SEARCH_URL, params=self._params(query), timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"YouTube search error: {e}")
+            return SEARCH_FAILED
+        return self._handle(key, response)
+
+    async def asearch(self, query: str) -> str:
+        """
+        Async variant of `search` that doesn't block the event loop while waiting on the API.
+        """
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self._get_async_client().get(YOUTUBE_SEARCH_URL, params=self._params(query))
+        except httpx.HTTPError as e:
+            print(f"YouTube search error: {e}")
+            return SEARCH_FAILED
+        return self._handle(key, response)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_keepalive_connections=self._pool_size),
+            )
+        return self._async_client
+
+    def _params(self, query: str) -> dict:
+        return {
+            "part": "snippet",
+            "type": "video",
+            "videoEmbeddable": "true",
+            "maxResults": 1,
+            "q": query,
+            "key": self.api_key or os.getenv("YOUTUBE_API_KEY"),
+        }
+
+    def _handle(self, key: str, response) -> str:
+        if response.status_code != 200:
+            return SEARCH_FAILED
+
+        items = response.json().get("items", [])
+        if not items:
+            result = VIDEO_NOT_FOUND
+        else:
+            video_id = items[0]["id"]["videoId"]
+            result = f"https://www.youtube.com/watch?v={video_id}"
+        self.cache.set(key, result)
+        return result
+
+
+_client = None
+
+
+def get_youtube_client() -> YouTubeSearchClient:
+    global _client
+    if _client is None:
+        _client = YouTubeSearchClient(
+            cache=TTLCache(
+                maxsize=int(os.getenv("CRAFTWISE_YOUTUBE_CACHE_SIZE", "1024")),
+                ttl=float(os.getenv("CRAFTWISE_YOUTUBE_CACHE_TTL", str(24 * 3600))),
+                path=os.getenv("CRAFTWISE_YOUTUBE_CACHE_PATH"),
+            ),
+        )
+    return _client
 
-YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
 def search_youtube(query: str) -> str:
     """
     Searches YouTube for a relevant video tutorial and returns the URL of the top result.
     """
-    search_url = (
-        "https://www.googleapis.com/youtube/v3/search"
-        f"?part=snippet&type=video&videoEmbeddable=true&maxResults=1"
-        f"&q={requests.utils.quote(query)}&key={YOUTUBE_API_KEY}"
-    )
-
-    response = requests.get(search_url)
-    if response.status_code != 200:
-        return "YouTube search failed."
-
-    items = response.json().get("items", [])
-    if not items:
-        return "No video found for this query."
-
-    video_id = items[0]["id"]["videoId"]
-    return f"https://www.youtube.com/watch?v={video_id}"
\ No newline at end of file
+    return get_youtube_client().search(query)
+
+
+async def asearch_youtube(query: str) -> str:
+    return await get_youtube_client().asearch(query)
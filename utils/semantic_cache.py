@@ -0,0 +1,173 @@
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+HASH_BITS = 18
+
+# Filler that paraphrases add or drop without changing the question
+STOPWORDS = {
+    "a", "an", "the", "i", "i'm", "im", "me", "my", "you", "your", "can", "could", "would", "please",
+    "any", "some", "do", "does", "to", "of", "for", "in", "on", "is", "are", "am", "be", "it", "and",
+    "so", "just", "how", "hi", "hey", "hello", "there",
+}
+
+
+def normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) & ((1 << HASH_BITS) - 1)
+
+
+def content_words(text: str) -> list:
+    words = re.findall(r"[\w']+", normalize(text))
+    # A bare greeting is all filler, but still a question worth caching
+    return [w for w in words if w not in STOPWORDS] or words
+
+
+def index_keys(text: str) -> set:
+    """Buckets of the content words, which is what the inverted index is built on."""
+    return {_bucket(f"w:{w}") for w in content_words(text)}
+
+
+def content_terms(text: str) -> frozenset:
+    """
+    The question's content words, singular. Vectors are length-normalised, so in a long question
+    swapping one word ("scarf" for "hat", "Sofia" for "Plovdiv") barely moves the score; a reply
+    is only reused when no content word was swapped, added or dropped.
+    """
+    return frozenset(w[:-1] if w.endswith("s") and not w.endswith("ss") and len(w) > 3 else w for w in content_words(text))
+
+
+def text_vector(text: str) -> dict:
+    """
+    Hashed, L2-normalised vector of content words, word bigrams and character trigrams.
+    Words carry most of the weight so "Sofia" vs "Plovdiv" isn't drowned out by shared trigrams.
+    """
+    words = content_words(text)
+    vec = {}
+
+    def add(feature, weight):
+        index = _bucket(feature)
+        vec[index] = vec.get(index, 0.0) + weight
+
+    for w in words:
+        add(f"w:{w}", 2.0)
+        padded = f"^{w}$"
+        for i in range(len(padded) - 2):
+            add(f"c:{padded[i:i + 3]}", 0.5)
+    for a, b in zip(words, words[1:]):
+        add(f"b:{a}_{b}", 1.0)
+
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {i: v / norm for i, v in vec.items()}
+
+
+def cosine(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+
+class SemanticCache:
+    """
+    Thread-safe answer cache keyed by meaning rather than exact text.
+
+    Questions are embedded locally as hashed n-gram vectors; a lookup returns the answer of the most
+    similar cached question if its cosine similarity reaches `threshold`. Candidates come from an
+    inverted index over content words, so a lookup only scores questions sharing a word.
+    If `anchors` is given, it maps a question to terms that must match exactly for a hit, whatever the score.
+    Entries expire after `ttl` seconds and at most `maxsize` are kept, least recently used first out.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 24 * 3600, threshold: float = 0.9, anchors=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.anchors = anchors
+        self.hits = 0
+        self.misses = 0
+        # question -> (vector, index keys, anchor terms, value, expires)
+        self._entries = OrderedDict()
+        self._postings = {}
+        self._lock = threading.Lock()
+
+    def get(self, question: str, default=None):
+        """Returns (value, similarity) of the nearest cached question, or `default` below the threshold."""
+        vector = text_vector(question)
+        anchors = self.anchors(question) if self.anchors else None
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for index in index_keys(question):
+                candidates.update(self._postings.get(index, ()))
+
+            best, best_score = None, 0.0
+            for key in candidates:
+                entry_vector, _, entry_anchors, _, expires = self._entries[key]
+                if expires <= now:
+                    self._remove(key)
+                    continue
+                if entry_anchors != anchors:
+                    continue
+                score = cosine(vector, entry_vector)
+                if score > best_score:
+                    best, best_score = key, score
+
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best][3], best_score
+
+    def set(self, question: str, value) -> None:
+        key = normalize(question)
+        vector = text_vector(question)
+        if not vector:
+            return
+        keys = index_keys(question)
+        anchors = self.anchors(question) if self.anchors else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, keys, anchors, value, time.time() + self.ttl)
+            for index in keys:
+                self._postings.setdefault(index, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, keys, _, _, _ = self._entries.pop(key)
+        for index in keys:
+            postings = self._postings.get(index)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._postings[index]
+
+
+response_cache = SemanticCache(
+    maxsize=int(os.getenv("CRAFTWISE_RESPONSE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("CRAFTWISE_RESPONSE_CACHE_TTL", str(24 * 3600))),
+    threshold=float(os.getenv("CRAFTWISE_RESPONSE_CACHE_THRESHOLD", "0.95")),
+    anchors=content_terms,
+)
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.context import ConversationContext
+from utils.state import CraftState
+
+
+class SessionState:
+    """Everything the app remembers about one browser session."""
+
+    def __init__(self, session_id: str = "default"):
+        # Also the supervisor's checkpoint thread id
+        self.session_id = session_id
+        self.craft_state = CraftState()
+        self.context = ConversationContext()
+        self.uploaded_file = None
+        self.media_processed = False
+        self.analysis_result = None
+        # Future of the media analysis started when the file was uploaded
+        self.analysis_job = None
+        self.last_seen = time.monotonic()
+
+
+class SessionStore:
+    """
+    Per-session state keyed by the Gradio session hash.
+
+    Sessions idle for longer than `idle_ttl` seconds are dropped, and at most `max_sessions`
+    are kept in memory (least recently used sessions are evicted first).
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 3600):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> SessionState:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = SessionState(session_id)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.last_seen = now
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def drop(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_idle(self, now: float) -> None:
+        # Sessions are ordered by last use, so the idle ones are all at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+
+
+sessions = SessionStore(
+    max_sessions=int(os.getenv("CRAFTWISE_MAX_SESSIONS", "1000")),
+    idle_ttl=float(os.getenv("CRAFTWISE_SESSION_TTL", "3600")),
+)
+
+
+def session_id_from_request(request) -> str:
+    """Gradio's session hash identifies a browser tab; fall back to a shared id outside the UI."""
+    return getattr(request, "session_hash", None) or "default"
@@ -1,6 +1,5 @@
 class CraftState:
     def __init__(self):
-        self.user_message = ""
         self.asked_for_video = False
         self.video_url = None
         self.project = ""
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.cache import TTLCache
+
+MAX_CHUNK_CHARS = 2000
+TRANSLATE_CONCURRENCY = 4
+
+# Only words that aren't also common in the Romance and Germanic languages ("a", "in", "on", "as", "can")
+ENGLISH_STOPWORDS = {
+    "the", "and", "of", "that", "for", "with", "is", "are", "this", "you", "your", "it", "by", "how",
+    "what", "which", "have", "will", "not", "but", "they", "be", "would", "should", "there", "their",
+    "about", "into", "when", "from", "than", "make", "to",
+}
+# Frequent words of the languages whose text is otherwise mostly ASCII
+OTHER_STOPWORDS = {
+    "el", "la", "los", "las", "de", "del", "que", "y", "en", "para", "con", "por", "una", "um", "uma",
+    "do", "da", "dos", "das", "não", "como", "le", "les", "des", "et", "est", "une", "pour", "dans",
+    "il", "di", "che", "per", "e", "gli", "der", "die", "und", "ist", "nicht", "mit", "zu", "ein", "eine",
+}
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+
+
+def split_into_chunks(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list:
+    """Splits text on paragraph, then sentence, then word boundaries into chunks of at most `max_chars`."""
+    chunks = []
+    current = ""
+    for piece in _pieces(text, max_chars):
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _pieces(text: str, max_chars: int):
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                yield sentence[:cut]
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                yield sentence
+
+
+def looks_english(text: str) -> bool:
+    """Cheap local check: mostly ASCII letters, a fair share of common English words and more of
+    them than of the common words of other languages written in Latin script."""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return True
+    ascii_words = sum(word.isascii() for word in words)
+    if ascii_words / len(words) < 0.9:
+        return False
+    english = sum(word in ENGLISH_STOPWORDS for word in words)
+    other = sum(word in OTHER_STOPWORDS for word in words)
+    return english / len(words) >= 0.1 and english > other
+
+
+class Translator:
+    """
+    Chunk-aware translation into English.
+
+    Text is split into bounded chunks, chunks that already look English are passed through,
+    the rest are translated concurrently and every chunk translation is memoised by its
+    content hash, so repeated sources are never translated twice.
+    """
+
+    def __init__(self, translate, atranslate=None, cache: TTLCache = None,
+                 max_chunk_chars: int = MAX_CHUNK_CHARS, concurrency: int = TRANSLATE_CONCURRENCY):
+        self._translate = translate
+        self._atranslate = atranslate
+        self.cache = cache if cache is not None else TTLCache(maxsize=4096, ttl=30 * 24 * 3600)
+        self.max_chunk_chars = max_chunk_chars
+        self.concurrency = concurrency
+
+    def translate(self, text: str) -> str:
+        chunks = split_into_chunks(text, self.max_chunk_chars)
+        pending = [chunk for chunk in dict.fromkeys(chunks) if self._lookup(chunk) is None]
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for chunk, translated in zip(pending, pool.map(self._translate, pending)):
+                    self.cache.set(self._key(chunk), translated)
+        return self._join(chunks)
+
+    async def atranslate(self, text: str) -> str:
+        chunks = split_into_chunks(text, self.max_chunk_chars)
+        pending = [chunk for chunk in dict.fromkeys(chunks) if self._lookup(chunk) is None]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def translate(chunk):
+            async with semaphore:
+                if self._atranslate is not None:
+                    return await self._atranslate(chunk)
+                return await asyncio.to_thread(self._translate, chunk)
+
+        for chunk, translated in zip(pending, await asyncio.gather(*(translate(c) for c in pending))):
+            self.cache.set(self._key(chunk), translated)
+        return self._join(chunks)
+
+    def _lookup(self, chunk: str):
+        if looks_english(chunk):
+            return chunk
+        return self.cache.get(self._key(chunk))
+
+    def _join(self, chunks: list) -> str:
+        return "\n\n".join(self._lookup(chunk) or chunk for chunk in chunks)
+
+    @staticmethod
+    def _key(chunk: str) -> str:
+        return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+
+def translation_cache() -> TTLCache:
+    return TTLCache(
+        maxsize=int(os.getenv("CRAFTWISE_TRANSLATION_CACHE_SIZE", "4096")),
+        ttl=float(os.getenv("CRAFTWISE_TRANSLATION_CACHE_TTL", str(30 * 24 * 3600))),
+        path=os.getenv("CRAFTWISE_TRANSLATION_CACHE_PATH"),
+    )
@@ -0,0 +1,190 @@
+"""
+Local classifier for "did the user explicitly ask for a video tutorial?".
+
+A multilingual keyword gate answers most messages outright (no video word, no video request).
+Messages that do mention videos are scored by a small logistic regression over hashed word and
+character n-gram features, whose weights ship with the repo in video_intent_model.json.
+Only scores in the ambiguous band between VIDEO_INTENT_LOW and VIDEO_INTENT_HIGH go to the LLM.
+
+Retrain after editing the training set with:
+    python -m utils.video_intent train benchmarks/data/video_intent_train.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import re
+import unicodedata
+import zlib
+from functools import cache
+
+from langchain_core.messages import HumanMessage
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "video_intent_model.json")
+HASH_BITS = 14
+
+# Scores between these two go to the LLM; everything else is answered locally
+VIDEO_INTENT_LOW = float(os.getenv("CRAFTWISE_VIDEO_INTENT_LOW", "0.2"))
+VIDEO_INTENT_HIGH = float(os.getenv("CRAFTWISE_VIDEO_INTENT_HIGH", "0.8"))
+
+# Words for videos and watching in the languages users write in; without one, nobody asked for a video
+VIDEO_NOUNS = r"vid[eéó]o|v[ií]deo|\bvids?\b|wideo|видео|відео|ビデオ|動画|视频|視頻|비디오|영상"
+VIDEO_TERMS = re.compile(
+    VIDEO_NOUNS + r"|youtu|\byt\b|ютуб|\bclips?\b|клип|\bwatch|\bschau|\bguard|\bregard|смотр|гледа|\bfilm",
+    re.IGNORECASE,
+)
+NEGATION_WORDS = (
+    r"\b(no|not|don'?t|without|never|skip|sin|sans|pas|ohne|kein|keine|non|niente|senza|sem|não|без|не|nie)\b"
+)
+NEGATION = re.compile(NEGATION_WORDS + r"|\b(rather|instead)\b|말고", re.IGNORECASE)
+# "no video", "kein Video", "без видео": a refusal, whatever the model makes of the rest
+NEGATED_VIDEO = re.compile(NEGATION_WORDS + r"[\s'-]+(\w+[\s'-]+){0,2}?(" + VIDEO_NOUNS + ")", re.IGNORECASE)
+# Talking about a video the user made or uploaded is feedback, not a request for a tutorial
+OWN_VIDEO = re.compile(
+    r"\b(my|i|i'm|i've|uploaded|recorded|filmed|filming|recording|sent|this)\b.{0,20}(vid[eé]o|clip|film)"
+    r"|(vid[eé]o|clip)\b.{0,12}\b(i|i've|of my)\b",
+    re.IGNORECASE,
+)
+
+video_intent_prompt = PromptTemplate.from_template("""
+You are a helpful assistant that determines whether a user is asking for a video tutorial explicitly.
+Answer only "yes" or "no". If there's no mention of the user asking for a video tutorial, always return no.
+
+User message: {message}
+""")
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def features(text: str) -> list:
+    """Word unigrams and bigrams, character trigrams (for inflections and languages without
+    spaces) and the keyword flags above."""
+    text = normalize(text)
+    words = re.findall(r"\w+", text)
+    feats = [f"w:{w}" for w in words]
+    feats += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"^{w}$"
+        feats += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    if VIDEO_TERMS.search(text):
+        feats.append("f:video")
+    if NEGATION.search(text):
+        feats.append("f:negation")
+    if OWN_VIDEO.search(text):
+        feats.append("f:own_video")
+    if text.rstrip().endswith("?"):
+        feats.append("f:question")
+    return feats
+
+
+def _bucket(feature: str) -> int:
+    # crc32 rather than hash(), which is salted per process
+    return zlib.crc32(feature.encode("utf-8")) & ((1 << HASH_BITS) - 1)
+
+
+def _vector(text: str) -> dict:
+    vec = {}
+    for feature in features(text):
+        index = _bucket(feature)
+        vec[index] = vec.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {i: v / norm for i, v in vec.items()}
+
+
+class VideoIntentModel:
+    """Logistic regression over hashed features, stored sparsely."""
+
+    def __init__(self, weights: dict, bias: float):
+        self.weights = weights
+        self.bias = bias
+
+    def probability(self, text: str) -> float:
+        score = self.bias + sum(self.weights.get(i, 0.0) * v for i, v in _vector(text).items())
+        return 1.0 / (1.0 + math.exp(-score))
+
+    @classmethod
+    def train(cls, examples: list, epochs: int = 60, learning_rate: float = 0.5, l2: float = 1e-4) -> "VideoIntentModel":
+        """Plain SGD in a fixed order, so retraining on the same data gives the same weights."""
+        weights, bias = {}, 0.0
+        vectors = [(_vector(text), 1.0 if label else 0.0) for text, label in examples]
+        for _ in range(epochs):
+            for vec, label in vectors:
+                score = bias + sum(weights.get(i, 0.0) * v for i, v in vec.items())
+                error = 1.0 / (1.0 + math.exp(-score)) - label
+                for i, v in vec.items():
+                    weights[i] = weights.get(i, 0.0) * (1 - learning_rate * l2) - learning_rate * error * v
+                bias -= learning_rate * error
+        return cls({i: w for i, w in weights.items() if abs(w) >= 1e-4}, bias)
+
+    def save(self, path: str = MODEL_PATH) -> None:
+        data = {
+            "hash_bits": HASH_BITS,
+            "bias": round(self.bias, 4),
+            "weights": {str(i): round(w, 4) for i, w in sorted(self.weights.items())},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "VideoIntentModel":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls({int(i): w for i, w in data["weights"].items()}, data["bias"])
+
+
+@cache
+def get_video_intent_model() -> VideoIntentModel:
+    return VideoIntentModel.load()
+
+
+def video_intent_probability(message: str) -> float:
+    text = normalize(message)
+    if not VIDEO_TERMS.search(text) or NEGATED_VIDEO.search(text):
+        return 0.0
+    return get_video_intent_model().probability(message)
+
+
+def local_video_intent(message: str):
+    """True or False when the local classifier is confident, None when only the LLM can tell."""
+    probability = video_intent_probability(message)
+    if probability >= VIDEO_INTENT_HIGH:
+        return True
+    if probability <= VIDEO_INTENT_LOW:
+        return False
+    return None
+
+
+def llm_video_intent(message: str, model: Runnable) -> bool:
+    prompt = video_intent_prompt.format(message=message)
+    result = model.invoke([HumanMessage(content=prompt)]).content.lower().strip()
+    return result.startswith("yes")
+
+
+async def allm_video_intent(message: str, model: Runnable) -> bool:
+    prompt = video_intent_prompt.format(message=message)
+    result = (await model.ainvoke([HumanMessage(content=prompt)])).content.lower().strip()
+    return result.startswith("yes")
+
+
+def load_examples(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["text"], row["video"]) for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local video intent classifier.")
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("data", help="JSONL file with {\"text\": ..., \"video\": true/false} rows")
+    parser.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    model = VideoIntentModel.train(examples)
+    model.save(args.output)
+    correct = sum((model.probability(text) >= 0.5) == label for text, label in examples)
+    print(f"Wrote {args.output} ({len(model.weights)} weights, training accuracy {correct / len(examples):.1%})")
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import os
+import threading
+from concurrent.futures import Future
+from functools import cache
+
+from utils.cache import TTLCache
+
+
+@cache
+def get_tavily_tool(k: int = 5):
+    """Shared Tavily search tool. The langchain_community import is deferred to first use
+    because it pulls in a large dependency tree."""
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    return TavilySearchResults(k=k)
+
+
+class WebSearchService:
+    """
+    Tavily search shared by the mentor, researcher and shopper tools.
+
+    Results are cached by query content with a TTL and LRU size bound, and concurrent
+    identical queries are coalesced so only one of them goes to the network (single flight).
+    """
+
+    def __init__(self, k: int = 5, cache: TTLCache = None):
+        self.k = k
+        self.cache = cache if cache is not None else TTLCache(maxsize=2048, ttl=6 * 3600)
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._ainflight = {}
+
+    def key(self, query: str) -> str:
+        normalized = " ".join(query.lower().split())
+        return hashlib.sha256(f"{self.k}:{normalized}".encode("utf-8")).hexdigest()
+
+    def search(self, query: str):
+        key = self.key(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            results = get_tavily_tool(self.k).run(query)
+            self._store(key, results)
+            future.set_result(results)
+            return results
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def asearch(self, query: str):
+        key = self.key(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._ainflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(get_tavily_tool(self.k).arun(query))
+        self._ainflight[key] = task
+        try:
+            results = await asyncio.shield(task)
+            self._store(key, results)
+            return results
+        finally:
+            self._ainflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "coalesced": self.coalesced}
+
+    def _store(self, key: str, results) -> None:
+        # Tavily reports errors as a plain string; only keep real result lists
+        if isinstance(results, list):
+            self.cache.set(key, results)
+
+
+_service = None
+
+
+def get_search_service() -> WebSearchService:
+    global _service
+    if _service is None:
+        _service = WebSearchService(
+            cache=TTLCache(
+                maxsize=int(os.getenv("CRAFTWISE_SEARCH_CACHE_SIZE", "2048")),
+                ttl=float(os.getenv("CRAFTWISE_SEARCH_CACHE_TTL", str(6 * 3600))),
+                path=os.getenv("CRAFTWISE_SEARCH_CACHE_PATH"),
+            ),
+        )
+    return _service